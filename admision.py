@@ -0,0 +1,267 @@
+import asyncio
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+# --- CONTROL DE ADMISIÓN Y TURNOS JUSTOS POR REVISOR ---
+# Un revisor que sube un candidato de 40 documentos, o que abre muchas
+# pestañas, no debe acaparar el servidor. Antes de extraer y llamar al
+# modelo, cada solicitud pide turno:
+#   - como máximo ADMISION_MAX_EN_CURSO evaluaciones corren a la vez, y
+#     ADMISION_MAX_POR_REVISOR por revisor (la IP del cliente, ver
+#     clave_revisor);
+#   - las demás esperan en una cola acotada (ADMISION_MAX_COLA solicitudes,
+#     ADMISION_MAX_COLA_POR_REVISOR por revisor y ADMISION_MAX_TRABAJO_COLA
+#     unidades de trabajo);
+#   - el orden es justo y ponderado (colas de equidad ponderada, WFQ): cada
+#     revisor avanza según el trabajo que ya consumió, de modo que una
+#     solicitud pequeña no queda detrás de un lote grande de otro revisor;
+#   - si la cola está llena, o la espera supera ADMISION_ESPERA_MAXIMA_S, se
+#     responde de inmediato 503 con Retry-After estimado según el trabajo
+#     pendiente.
+# El trabajo de una solicitud se estima por páginas e imágenes de sus PDF.
+# ADMISION_MAX_EN_CURSO=0 desactiva el control.
+
+ADMISION_MAX_EN_CURSO = int(os.environ.get("ADMISION_MAX_EN_CURSO", 8))
+ADMISION_MAX_POR_REVISOR = int(os.environ.get("ADMISION_MAX_POR_REVISOR", 2))
+ADMISION_MAX_COLA = int(os.environ.get("ADMISION_MAX_COLA", 16))
+ADMISION_MAX_COLA_POR_REVISOR = int(os.environ.get("ADMISION_MAX_COLA_POR_REVISOR", 4))
+ADMISION_MAX_TRABAJO_COLA = int(os.environ.get("ADMISION_MAX_TRABAJO_COLA", 400))
+ADMISION_ESPERA_MAXIMA_S = float(os.environ.get("ADMISION_ESPERA_MAXIMA_S", 120))
+# Pesos por revisor para el orden justo, ej. "coordinacion=3,ana@sena.edu.co=2" (defecto 1)
+ADMISION_PESOS = os.environ.get("ADMISION_PESOS", "")
+# Identidad del revisor. Ambas cabeceras las controla el cliente, así que:
+#   - de X-Forwarded-For se toma la IP que agregó el último proxy confiable
+#     (ADMISION_PROXIES_CONFIABLES saltos contados desde el final; Cloud Run
+#     agrega uno; 0 = ignorar la cabecera y usar la IP de la conexión);
+#   - X-Revisor solo se respeta si viene con X-Revisor-Clave igual a
+#     ADMISION_CLAVE_REVISOR (ej. un proxy autenticado o bench_carga.py).
+ADMISION_PROXIES_CONFIABLES = int(os.environ.get("ADMISION_PROXIES_CONFIABLES", 1))
+ADMISION_CLAVE_REVISOR = os.environ.get("ADMISION_CLAVE_REVISOR", "")
+# Estimación inicial de segundos por unidad de trabajo; luego se ajusta con lo observado
+SEGUNDOS_POR_UNIDAD = float(os.environ.get("ADMISION_SEGUNDOS_POR_UNIDAD", 0.5))
+
+PESO_IMAGEN = 2
+RE_PAGINA = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+RE_IMAGEN = re.compile(rb"/Subtype\s*/Image")
+
+
+def estimar_trabajo(documentos):
+    """Unidades de trabajo de una solicitud: 1 + páginas + PESO_IMAGEN por imagen.
+
+    documentos: lista de bytes de PDF. Las páginas se cuentan sin parsear el
+    PDF (los objetos comprimidos no se ven: cada documento cuenta al menos 1).
+    """
+    trabajo = 1
+    for data in documentos:
+        trabajo += max(1, len(RE_PAGINA.findall(data))) + PESO_IMAGEN * len(RE_IMAGEN.findall(data))
+    return trabajo
+
+
+def _leer_pesos(texto):
+    pesos = {}
+    for par in filter(None, (p.strip() for p in texto.split(","))):
+        clave, _, peso = par.rpartition("=")
+        pesos[clave.strip()] = float(peso)
+    return pesos
+
+
+class Rechazada(Exception):
+    """No hay turno: la cola está llena o la espera excedió el máximo."""
+
+    def __init__(self, motivo, reintentar_en):
+        super().__init__(motivo)
+        self.motivo = motivo
+        self.reintentar_en = reintentar_en
+
+
+class _Turno:
+    def __init__(self, clave, trabajo, etiqueta, notificar):
+        self.clave = clave
+        self.trabajo = trabajo
+        self.etiqueta = etiqueta  # Tiempo virtual de fin (WFQ)
+        self.notificar = notificar
+        self.llegada = time.monotonic()
+        self.inicio = None
+
+
+class Admision:
+    """Cola de admisión con topes globales y por revisor, y orden WFQ."""
+
+    def __init__(self, max_en_curso=ADMISION_MAX_EN_CURSO, max_por_revisor=ADMISION_MAX_POR_REVISOR,
+                 max_cola=ADMISION_MAX_COLA, max_cola_por_revisor=ADMISION_MAX_COLA_POR_REVISOR,
+                 max_trabajo_cola=ADMISION_MAX_TRABAJO_COLA, espera_maxima_s=ADMISION_ESPERA_MAXIMA_S,
+                 pesos=None):
+        self.max_en_curso = max_en_curso
+        self.max_por_revisor = max_por_revisor
+        self.max_cola = max_cola
+        self.max_cola_por_revisor = max_cola_por_revisor
+        self.max_trabajo_cola = max_trabajo_cola
+        self.espera_maxima_s = espera_maxima_s
+        self.pesos = _leer_pesos(ADMISION_PESOS) if pesos is None else pesos
+        self.segundos_por_unidad = SEGUNDOS_POR_UNIDAD
+
+        self._lock = threading.Lock()
+        self._cola = []
+        self._en_curso = {}         # clave -> turnos en curso
+        self._total_en_curso = 0
+        self._fin_virtual = {}      # clave -> etiqueta de su última solicitud
+        self._tiempo_virtual = 0.0
+        self._esperas = deque(maxlen=1000)
+        self._contadores = {"admitidas": 0, "rechazadas_cola_llena": 0, "rechazadas_espera": 0}
+
+    @property
+    def activa(self):
+        return self.max_en_curso > 0
+
+    # --- Estado interno (siempre bajo self._lock) ---
+    def _reintentar_en(self, trabajo_extra=0):
+        pendiente = sum(t.trabajo for t in self._cola) + trabajo_extra
+        return max(1, math.ceil(pendiente * self.segundos_por_unidad / max(self.max_en_curso, 1)))
+
+    def _encolar(self, clave, trabajo, notificar):
+        en_cola_revisor = sum(1 for t in self._cola if t.clave == clave)
+        trabajo_cola = sum(t.trabajo for t in self._cola)
+        if (len(self._cola) >= self.max_cola or en_cola_revisor >= self.max_cola_por_revisor
+                or (self._cola and trabajo_cola + trabajo > self.max_trabajo_cola)):
+            self._contadores["rechazadas_cola_llena"] += 1
+            raise Rechazada("Servidor ocupado: la cola de evaluaciones está llena.",
+                            self._reintentar_en(trabajo))
+
+        inicio_virtual = max(self._tiempo_virtual, self._fin_virtual.get(clave, 0.0))
+        etiqueta = inicio_virtual + trabajo / self.pesos.get(clave, 1.0)
+        self._fin_virtual[clave] = etiqueta
+        turno = _Turno(clave, trabajo, etiqueta, notificar)
+        self._cola.append(turno)
+        self._despachar()
+        return turno
+
+    def _despachar(self):
+        while self._total_en_curso < self.max_en_curso:
+            elegibles = [t for t in self._cola if self._en_curso.get(t.clave, 0) < self.max_por_revisor]
+            if not elegibles:
+                return
+            turno = min(elegibles, key=lambda t: (t.etiqueta, t.llegada))
+            self._cola.remove(turno)
+            self._en_curso[turno.clave] = self._en_curso.get(turno.clave, 0) + 1
+            self._total_en_curso += 1
+            inicio_virtual = turno.etiqueta - turno.trabajo / self.pesos.get(turno.clave, 1.0)
+            self._tiempo_virtual = max(self._tiempo_virtual, inicio_virtual)
+            turno.inicio = time.monotonic()
+            self._esperas.append(turno.inicio - turno.llegada)
+            self._contadores["admitidas"] += 1
+            turno.notificar()
+
+    def _abandonar(self, turno):
+        """Retira de la cola un turno que dejó de esperar; False si ya fue admitido."""
+        if turno.inicio is not None:
+            return False
+        self._cola.remove(turno)
+        return True
+
+    def _liberar(self, turno):
+        with self._lock:
+            self._en_curso[turno.clave] -= 1
+            if not self._en_curso[turno.clave]:
+                del self._en_curso[turno.clave]
+            self._total_en_curso -= 1
+            # Media móvil de segundos por unidad de trabajo, para el Retry-After
+            duracion = time.monotonic() - turno.inicio
+            self.segundos_por_unidad = 0.8 * self.segundos_por_unidad + 0.2 * duracion / turno.trabajo
+            if not self._total_en_curso and not self._cola:
+                # Sin carga: se reinicia el reloj virtual para no arrastrar historia
+                self._fin_virtual.clear()
+                self._tiempo_virtual = 0.0
+            self._despachar()
+
+    # --- Interfaz para hilos (Flask) ---
+    @contextmanager
+    def turno(self, clave, trabajo):
+        """Bloquea hasta obtener turno; lanza Rechazada si no hay cupo en la cola o si la espera se agota."""
+        if not self.activa:
+            yield
+            return
+        evento = threading.Event()
+        with self._lock:
+            turno = self._encolar(clave, trabajo, evento.set)
+        if not evento.wait(self.espera_maxima_s):
+            with self._lock:
+                if self._abandonar(turno):
+                    self._contadores["rechazadas_espera"] += 1
+                    raise Rechazada("Tiempo de espera agotado en la cola de evaluaciones.",
+                                    self._reintentar_en())
+        try:
+            yield
+        finally:
+            self._liberar(turno)
+
+    # --- Interfaz asíncrona (ASGI) ---
+    @asynccontextmanager
+    async def turno_async(self, clave, trabajo):
+        if not self.activa:
+            yield
+            return
+        loop = asyncio.get_running_loop()
+        listo = loop.create_future()
+
+        def notificar():
+            loop.call_soon_threadsafe(lambda: listo.done() or listo.set_result(None))
+
+        with self._lock:
+            turno = self._encolar(clave, trabajo, notificar)
+        try:
+            await asyncio.wait_for(asyncio.shield(listo), self.espera_maxima_s)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if self._abandonar(turno):
+                    self._contadores["rechazadas_espera"] += 1
+                    raise Rechazada("Tiempo de espera agotado en la cola de evaluaciones.",
+                                    self._reintentar_en())
+        except asyncio.CancelledError:
+            # El cliente se desconectó mientras esperaba: no debe quedar ocupando turno
+            with self._lock:
+                admitido = not self._abandonar(turno)
+            if admitido:
+                self._liberar(turno)
+            raise
+        try:
+            yield
+        finally:
+            self._liberar(turno)
+
+    def metricas(self):
+        """Profundidad de la cola, evaluaciones en curso y percentiles de espera (s)."""
+        with self._lock:
+            esperas = sorted(self._esperas)
+            return {
+                "activa": self.activa,
+                "en_curso": self._total_en_curso,
+                "en_curso_por_revisor": dict(self._en_curso),
+                "en_cola": len(self._cola),
+                "trabajo_en_cola": sum(t.trabajo for t in self._cola),
+                "espera_p50_s": round(esperas[len(esperas) // 2], 3) if esperas else 0.0,
+                "espera_p99_s": round(esperas[min(len(esperas) - 1, int(len(esperas) * 0.99))], 3) if esperas else 0.0,
+                "segundos_por_unidad": round(self.segundos_por_unidad, 3),
+                **self._contadores,
+            }
+
+
+def clave_revisor(headers, remote_addr, proxies=None, clave=None):
+    """Revisor de la solicitud: X-Revisor de una fuente confiable o la IP de origen.
+
+    La IP es la que agregó el último de los `proxies` confiables en
+    X-Forwarded-For; los saltos anteriores los pudo escribir el cliente.
+    """
+    proxies = ADMISION_PROXIES_CONFIABLES if proxies is None else proxies
+    clave = ADMISION_CLAVE_REVISOR if clave is None else clave
+    revisor = (headers.get("X-Revisor") or "").strip()
+    if revisor and clave and headers.get("X-Revisor-Clave") == clave:
+        return revisor
+    saltos = [s.strip() for s in (headers.get("X-Forwarded-For") or "").split(",") if s.strip()]
+    if proxies and saltos:
+        return saltos[-min(proxies, len(saltos))]
+    return remote_addr or "desconocido"
@@ -0,0 +1,226 @@
+import io
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import types
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: sin límite de memoria por proceso
+    resource = None
+
+from deduplicacion import imagen_de_pdf, MIN_CARACTERES_TEXTO
+from extractores import extraer_texto
+import perfilado
+
+# --- EXTRACCIÓN AISLADA EN PROCESOS ---
+# Un PDF malformado o malicioso puede dejar al extractor girando sin fin o
+# agotar la memoria. Cada documento se lee en un proceso de trabajo con:
+#   - plazo de PLAZO_EXTRACCION_S segundos (reloj de pared),
+#   - límite de memoria de MEMORIA_EXTRACCION_MB (RLIMIT_AS, solo Unix),
+#   - tope de MAX_PAGINAS_PDF páginas (ver extractores.py).
+# Si un proceso excede el plazo o muere, se mata y se reemplaza; el documento
+# se reporta como ilegible ("[Error PDF: ...]") y las demás solicitudes siguen
+# su curso con el resto de procesos.
+
+EXTRACCION_AISLADA_PROCESOS = int(os.environ.get("EXTRACCION_AISLADA_PROCESOS", os.cpu_count() or 2))
+PLAZO_EXTRACCION_S = float(os.environ.get("PLAZO_EXTRACCION_S", 30))
+MEMORIA_EXTRACCION_MB = int(os.environ.get("MEMORIA_EXTRACCION_MB", 1024))
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentoIlegible(Exception):
+    """El documento agotó el plazo o la memoria del proceso de extracción."""
+
+
+def _trabajador(conn, memoria_mb):
+    """Bucle del proceso de trabajo: recibe (funcion, args) y responde (ok, valor)."""
+    if resource and memoria_mb:
+        limite = memoria_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limite, limite))
+    while True:
+        try:
+            funcion, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send((True, funcion(*args)))
+        except MemoryError:
+            conn.send((False, f"excedió el límite de memoria ({memoria_mb} MB)"))
+            return  # El proceso puede quedar inestable: se reemplaza
+        except Exception as e:
+            conn.send((False, str(e)))
+
+
+_arranque_lock = threading.Lock()
+
+
+@contextmanager
+def _sin_main():
+    """Oculta el __main__ del proceso padre mientras arranca un proceso de trabajo.
+
+    Con "spawn" el hijo vuelve a ejecutar el script principal. Bajo Streamlit
+    ese script es evaluador_sena_ai.py, sin guardia __name__: cada proceso de
+    extracción ejecutaría la interfaz completa. Los procesos de trabajo solo
+    necesitan este módulo.
+    """
+    with _arranque_lock:
+        principal = sys.modules["__main__"]
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            yield
+        finally:
+            sys.modules["__main__"] = principal
+
+
+class _Proceso:
+    def __init__(self, contexto, memoria_mb):
+        self.conn, conn_hijo = contexto.Pipe()
+        self.proceso = contexto.Process(target=_trabajador, args=(conn_hijo, memoria_mb), daemon=True)
+        with _sin_main():
+            self.proceso.start()
+        conn_hijo.close()
+
+    def terminar(self):
+        self.proceso.kill()
+        self.proceso.join()
+        self.conn.close()
+
+
+class PoolAislado:
+    """Procesos de trabajo reutilizables; uno por tarea en curso.
+
+    ejecutar() es seguro entre hilos: cada hilo toma un proceso libre (o crea
+    uno, hasta `procesos`) y espera su respuesta como máximo `plazo_s`.
+    """
+
+    def __init__(self, procesos=EXTRACCION_AISLADA_PROCESOS, plazo_s=PLAZO_EXTRACCION_S,
+                 memoria_mb=MEMORIA_EXTRACCION_MB):
+        self.plazo_s = plazo_s
+        self.memoria_mb = memoria_mb
+        # "spawn": el servidor tiene hilos activos y un fork podría heredar locks tomados
+        self._contexto = multiprocessing.get_context("spawn")
+        self._cupos = threading.BoundedSemaphore(procesos)
+        self._libres = []
+        self._lock = threading.Lock()
+        self.reemplazados = 0
+
+    def _tomar(self):
+        with self._lock:
+            if self._libres:
+                return self._libres.pop()
+        return _Proceso(self._contexto, self.memoria_mb)
+
+    def _devolver(self, proceso):
+        with self._lock:
+            self._libres.append(proceso)
+
+    def _descartar(self, proceso):
+        proceso.terminar()
+        with self._lock:
+            self.reemplazados += 1
+
+    def ejecutar(self, funcion, *args):
+        """Resultado de funcion(*args) en un proceso aislado; DocumentoIlegible si se cuelga o muere."""
+        with self._cupos:
+            proceso = self._tomar()
+            try:
+                proceso.conn.send((funcion, args))
+                if not proceso.conn.poll(self.plazo_s):
+                    self._descartar(proceso)
+                    raise DocumentoIlegible(f"la extracción excedió el plazo de {self.plazo_s:g} s")
+                ok, valor = proceso.conn.recv()
+            except (EOFError, OSError):
+                self._descartar(proceso)
+                raise DocumentoIlegible("el proceso de extracción terminó abruptamente")
+            if not ok:
+                if proceso.proceso.is_alive():
+                    self._devolver(proceso)
+                else:
+                    self._descartar(proceso)
+                raise DocumentoIlegible(valor)
+            self._devolver(proceso)
+            return valor
+
+    def cerrar(self):
+        with self._lock:
+            libres, self._libres = self._libres, []
+        for proceso in libres:
+            proceso.terminar()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configurar(**opciones):
+    """Reemplaza el pool global (ej. configurar(procesos=8) desde la línea de comandos)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.cerrar()
+        _pool = PoolAislado(**opciones)
+    return _pool
+
+
+def pool_extraccion():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PoolAislado()
+        return _pool
+
+
+def _leer_pdf(data, con_imagen):
+    # Corre dentro del proceso de trabajo
+    try:
+        texto, _ = extraer_texto(data)
+    except Exception as e:
+        return f"[Error PDF: {str(e)}]", None
+    imagen = None
+    if con_imagen and len(texto.strip()) < MIN_CARACTERES_TEXTO:
+        imagen = imagen_de_pdf(io.BytesIO(data))
+    return texto, imagen
+
+
+def peso_extraccion(valor):
+    """Bytes aproximados que ocupa en memoria un resultado (texto, imagen) o un texto."""
+    texto, imagen = valor if isinstance(valor, tuple) else (valor, None)
+    peso = len(texto or "")
+    if imagen is not None:
+        peso += imagen.width * imagen.height * len(imagen.getbands())
+    return peso
+
+
+def es_error(valor):
+    """Si un resultado (texto, imagen) o un texto es un "[Error PDF: ...]".
+
+    Puede ser transitorio (plazo vencido, proceso caído): no se recuerda.
+    """
+    texto = valor[0] if isinstance(valor, tuple) else valor
+    return isinstance(texto, str) and texto.startswith("[Error PDF")
+
+
+def leer_pdf(data, con_imagen=True):
+    """(texto, imagen) de un PDF leído en un proceso aislado.
+
+    La imagen (primera imagen embebida) solo se extrae si el PDF casi no tiene
+    texto, es decir, si parece escaneado. Un documento que se cuelga o agota
+    la memoria se reporta como "[Error PDF: ...]".
+    """
+    try:
+        perfil = perfilado.actual()
+        if perfil is None:
+            return pool_extraccion().ejecutar(_leer_pdf, data, con_imagen)
+        # Solicitud perfilada: el proceso de trabajo también se muestrea
+        valor, parcial = pool_extraccion().ejecutar(perfilado.perfilar_llamada, _leer_pdf,
+                                                    (data, con_imagen), perfil.intervalo, perfil.memoria)
+        perfil.agregar(parcial)
+        return valor
+    except DocumentoIlegible as e:
+        logger.warning("Documento ilegible (%d bytes): %s", len(data), e)
+        return f"[Error PDF: documento ilegible, {e}]", None
@@ -0,0 +1,319 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+# --- ALMACÉN DE EVALUACIONES (SQLite) ---
+# Cada evaluación queda guardada con su resultado para poder responder
+# "¿qué se decidió sobre la cédula X?" sin volver a llamar al modelo.
+# Modo WAL: los lectores no bloquean al escritor y varios hilos de gunicorn
+# pueden escribir (SQLite serializa las escrituras; busy_timeout espera el turno).
+# El texto de los soportes se indexa con FTS5 para buscar candidatos que ya
+# aportaron cierta evidencia sin volver a evaluarlos.
+
+DB_PATH = os.environ.get("EVALUACIONES_DB", "evaluaciones.db")
+
+_local = threading.local()
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS evaluaciones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cedula TEXT NOT NULL,
+    nombre TEXT,
+    perfil_hash TEXT,
+    modelo TEXT,
+    concepto TEXT,
+    resultado TEXT,
+    tiempos TEXT,
+    documentos TEXT,
+    origen TEXT,
+    creado_en TEXT NOT NULL,
+    consumo TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_evaluaciones_cedula ON evaluaciones (cedula, creado_en);
+CREATE INDEX IF NOT EXISTS idx_evaluaciones_perfil ON evaluaciones (perfil_hash, creado_en);
+CREATE INDEX IF NOT EXISTS idx_evaluaciones_fecha ON evaluaciones (creado_en);
+
+CREATE TABLE IF NOT EXISTS soportes (
+    id INTEGER PRIMARY KEY,
+    cedula TEXT NOT NULL,
+    nombre TEXT,
+    doc_hash TEXT NOT NULL,
+    archivo TEXT,
+    texto TEXT,
+    creado_en TEXT NOT NULL,
+    UNIQUE (cedula, doc_hash)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS soportes_fts USING fts5(
+    texto, content='soportes', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS soportes_ai AFTER INSERT ON soportes BEGIN
+    INSERT INTO soportes_fts (rowid, texto) VALUES (new.id, new.texto);
+END;
+CREATE TRIGGER IF NOT EXISTS soportes_ad AFTER DELETE ON soportes BEGIN
+    INSERT INTO soportes_fts (soportes_fts, rowid, texto) VALUES ('delete', old.id, old.texto);
+END;
+"""
+
+# Columnas agregadas después de la primera versión: (nombre, tipo)
+MIGRACIONES = [("consumo", "TEXT")]
+
+
+def _migrar(conn):
+    columnas = {f["name"] for f in conn.execute("PRAGMA table_info(evaluaciones)")}
+    for nombre, tipo in MIGRACIONES:
+        if nombre not in columnas:
+            try:
+                conn.execute(f"ALTER TABLE evaluaciones ADD COLUMN {nombre} {tipo}")
+            except sqlite3.OperationalError:
+                pass  # Otro proceso la agregó al mismo tiempo
+
+
+def conexion(db_path=None):
+    """Conexión propia de cada hilo (sqlite3 no comparte conexiones entre hilos)."""
+    db_path = db_path or DB_PATH
+    conexiones = getattr(_local, "conexiones", None)
+    if conexiones is None:
+        conexiones = _local.conexiones = {}
+
+    conn = conexiones.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.executescript(ESQUEMA)
+        _migrar(conn)
+        conexiones[db_path] = conn
+    return conn
+
+
+def normalizar_cedula(cedula):
+    """Quita puntos, espacios y guiones: '1.075.234.567' -> '1075234567'."""
+    return re.sub(r"[^0-9A-Za-z]", "", str(cedula or ""))
+
+
+def hash_perfil(texto_pdf=None, texto_adicional=None):
+    """Huella del perfil: el contenido de los requisitos (texto del PDF y texto manual).
+
+    No incluye nombres de archivo ni los encabezados con que cada front end
+    arma el prompt, y se normalizan los espacios: los mismos requisitos dan
+    el mismo hash desde Flask, Streamlit o la línea de comandos.
+    """
+    partes = [" ".join(texto.split()) for texto in (texto_pdf, texto_adicional) if texto and texto.strip()]
+    return hashlib.sha256("\n".join(partes).encode("utf-8")).hexdigest()
+
+
+def guardar_evaluacion(cedula, nombre, perfil_hash, modelo, resultado, concepto=None,
+                       tiempos=None, documentos=None, origen=None, consumo=None, db_path=None):
+    """Guarda una evaluación y retorna su id.
+
+    - resultado: dict con la respuesta parseada del modelo.
+    - tiempos: dict de segundos por etapa, ej. {"extraccion": 1.2, "modelo": 8.4}.
+    - documentos: lista de dicts {"nombre", "hash"} de los soportes evaluados.
+    - consumo: tokens y costo de las llamadas al modelo (ver enrutamiento.sumar_consumo).
+    """
+    conn = conexion(db_path)
+    with conn:
+        cur = conn.execute(
+            "INSERT INTO evaluaciones (cedula, nombre, perfil_hash, modelo, concepto, resultado,"
+            " tiempos, documentos, origen, creado_en, consumo) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                normalizar_cedula(cedula),
+                nombre,
+                perfil_hash,
+                modelo,
+                concepto,
+                json.dumps(resultado, ensure_ascii=False),
+                json.dumps(tiempos or {}),
+                json.dumps(documentos or [], ensure_ascii=False),
+                origen,
+                datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                json.dumps(consumo) if consumo else None,
+            ),
+        )
+    _programar_analitica(db_path)
+    return cur.lastrowid
+
+
+def _programar_analitica(db_path):
+    # Copia en Parquet para los reportes de gestión (ver analitica.py)
+    try:
+        from analitica import programar_exportacion
+    except ImportError:  # Sin pandas/pyarrow: no hay exportación analítica
+        return
+    programar_exportacion(db_path)
+
+
+def _a_dict(fila):
+    evaluacion = dict(fila)
+    for campo in ("resultado", "tiempos", "documentos", "consumo"):
+        evaluacion[campo] = json.loads(evaluacion[campo]) if evaluacion[campo] else None
+    return evaluacion
+
+
+def buscar_por_cedula(cedula, limite=20, db_path=None):
+    """Evaluaciones de una cédula, de la más reciente a la más antigua."""
+    filas = conexion(db_path).execute(
+        "SELECT * FROM evaluaciones WHERE cedula = ? ORDER BY creado_en DESC, id DESC LIMIT ?",
+        (normalizar_cedula(cedula), limite),
+    ).fetchall()
+    return [_a_dict(f) for f in filas]
+
+
+def listar_evaluaciones(perfil_hash=None, desde=None, hasta=None, limite=100, db_path=None):
+    """Evaluaciones filtradas por perfil y/o rango de fechas ISO (AAAA-MM-DD)."""
+    condiciones, params = [], []
+    if perfil_hash:
+        condiciones.append("perfil_hash = ?")
+        params.append(perfil_hash)
+    if desde:
+        condiciones.append("creado_en >= ?")
+        params.append(desde)
+    if hasta:
+        # 'hasta' es inclusivo: se compara contra el día siguiente
+        condiciones.append("creado_en < date(?, '+1 day')")
+        params.append(hasta)
+
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    filas = conexion(db_path).execute(
+        f"SELECT * FROM evaluaciones {where} ORDER BY creado_en DESC, id DESC LIMIT ?",
+        (*params, limite),
+    ).fetchall()
+    return [_a_dict(f) for f in filas]
+
+
+def estadisticas_prefiltro(desde=None, hasta=None, db_path=None):
+    """Cuántas evaluaciones resolvió el prefiltro local (modelo = 'prefiltro') y por qué regla."""
+    condiciones, params = [], []
+    if desde:
+        condiciones.append("creado_en >= ?")
+        params.append(desde)
+    if hasta:
+        condiciones.append("creado_en < date(?, '+1 day')")
+        params.append(hasta)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+    conn = conexion(db_path)
+    total, prefiltradas = conn.execute(
+        f"SELECT COUNT(*), COALESCE(SUM(modelo = 'prefiltro'), 0) FROM evaluaciones {where}", params,
+    ).fetchone()
+    por_regla = dict(conn.execute(
+        f"""
+        SELECT json_extract(r.value, '$.regla'), COUNT(*)
+        FROM evaluaciones AS e, json_each(e.resultado, '$.prefiltro.reglas') AS r
+        {where.replace('creado_en', 'e.creado_en')} {'AND' if where else 'WHERE'} e.modelo = 'prefiltro'
+        GROUP BY 1
+        """,
+        params,
+    ).fetchall())
+    return {
+        "evaluaciones": total,
+        "prefiltradas": prefiltradas,
+        "tasa": round(prefiltradas / total, 4) if total else 0.0,
+        "por_regla": por_regla,
+    }
+
+
+# --- BÚSQUEDA DE EVIDENCIA (FTS5) ---
+def indexar_soportes(cedula, nombre, soportes, db_path=None):
+    """Indexa el texto extraído de los soportes de un candidato.
+
+    soportes: lista de dicts con 'nombre' (archivo), 'hash' y 'texto'. Un mismo
+    documento del mismo candidato se indexa una sola vez.
+    """
+    creado_en = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    filas = [
+        (normalizar_cedula(cedula), nombre, s["hash"], s["nombre"], s["texto"], creado_en)
+        for s in soportes if (s.get("texto") or "").strip()
+    ]
+    conn = conexion(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO soportes (cedula, nombre, doc_hash, archivo, texto, creado_en)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            filas,
+        )
+
+
+def terminos_fts(terminos):
+    """Convierte los términos del usuario en términos FTS5 seguros.
+
+    Acepta una lista de términos o un texto donde las frases van entre
+    comillas: '"Tecnólogo en Gestión Ambiental" experiencia'. Cada término se
+    cita para que caracteres como '-' o ':' no se interpreten como operadores.
+    """
+    if isinstance(terminos, str):
+        terminos = [a or b for a, b in re.findall(r'"([^"]+)"|(\S+)', terminos)]
+    return ['"' + t.replace('"', '""') + '"' for t in terminos if re.search(r"\w", t)]
+
+
+def buscar_evidencia(terminos, modo="todos", limite=20, pasajes_por_candidato=3, db_path=None):
+    """Candidatos cuyos soportes coinciden con los términos, ordenados por relevancia (BM25).
+
+    modo "todos": el candidato debe tener cada término en alguno de sus
+    soportes (no necesariamente en el mismo). modo "alguno": basta uno.
+
+    Retorna una lista de dicts con 'cedula', 'nombre', 'puntaje' (mayor es
+    mejor) y 'pasajes' (archivo, doc_hash y fragmento resaltado).
+    """
+    citados = terminos_fts(terminos)
+    if not citados:
+        return []
+    conn = conexion(db_path)
+
+    permitidos = None
+    if modo == "todos" and len(citados) > 1:
+        for termino in citados:
+            cedulas = {f["cedula"] for f in conn.execute(
+                "SELECT DISTINCT s.cedula FROM soportes_fts AS f JOIN soportes AS s ON s.id = f.rowid"
+                " WHERE soportes_fts MATCH ?", (termino,))}
+            permitidos = cedulas if permitidos is None else permitidos & cedulas
+            if not permitidos:
+                return []
+
+    filas = conn.execute(
+        """
+        SELECT s.cedula, s.nombre, s.archivo, s.doc_hash, f.rank AS rank,
+               snippet(soportes_fts, 0, '[', ']', '…', 16) AS fragmento
+        FROM soportes_fts AS f
+        JOIN soportes AS s ON s.id = f.rowid
+        WHERE soportes_fts MATCH ?
+        ORDER BY f.rank
+        """,
+        (" OR ".join(citados),),
+    )
+
+    candidatos = {}
+    for fila in filas:
+        if permitidos is not None and fila["cedula"] not in permitidos:
+            continue
+        candidato = candidatos.get(fila["cedula"])
+        if candidato is None:
+            if len(candidatos) >= limite:
+                break
+            candidato = candidatos[fila["cedula"]] = {
+                "cedula": fila["cedula"],
+                "nombre": fila["nombre"],
+                "puntaje": round(-fila["rank"], 4),
+                "pasajes": [],
+            }
+        if len(candidato["pasajes"]) < pasajes_por_candidato:
+            candidato["pasajes"].append({
+                "archivo": fila["archivo"],
+                "doc_hash": fila["doc_hash"],
+                "fragmento": fila["fragmento"],
+            })
+    return list(candidatos.values())
+
+
+def optimizar_indice(db_path=None):
+    """Fusiona los segmentos del índice FTS5 (útil tras cargas masivas)."""
+    conn = conexion(db_path)
+    with conn:
+        conn.execute("INSERT INTO soportes_fts (soportes_fts) VALUES ('optimize')")
@@ -0,0 +1,453 @@
+"""Exportación analítica (Parquet) de las evaluaciones y reportes mensuales.
+
+    python analitica.py exportar
+    python analitica.py compactar
+    python analitica.py reporte --anio 2026 --mes 10
+
+Cada evaluación guardada en el almacén (almacen.py) se agrega a archivos
+Parquet particionados por año y mes, con columnas planas listas para
+agregar: concepto, meses certificados, motivos de rechazo, tiempos, tokens
+y costo. Las filas de experiencia_lista van en una tabla aparte. Así los
+reportes de gestión sobre cientos de miles de evaluaciones se calculan en
+segundos, sin abrir los Excel de IDONEIDAD uno por uno.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from almacen import conexion
+
+# --- EXPORTACIÓN INCREMENTAL ---
+# SQLite sigue siendo la fuente de verdad; el Parquet se deriva de él. Cada
+# archivo se llama parte-<id inicial>-<id final>.parquet, y el mayor id
+# exportado es la marca desde la que continúa la siguiente exportación: si
+# un proceso muere antes de exportar, nada se pierde. Tras guardar una
+# evaluación se programa una exportación en segundo plano a los
+# ANALITICA_RETRASO_S segundos, que agrupa en un solo archivo todo lo
+# guardado en esa ventana. Cuando una partición acumula ANALITICA_MAX_PARTES
+# archivos se compacta en uno.
+
+ANALITICA_DIR = os.environ.get("ANALITICA_DIR", "analitica")
+ANALITICA_AUTO = os.environ.get("ANALITICA_AUTO", "1") != "0"
+ANALITICA_RETRASO_S = float(os.environ.get("ANALITICA_RETRASO_S", 30))
+ANALITICA_MAX_PARTES = int(os.environ.get("ANALITICA_MAX_PARTES", 50))
+FILAS_POR_LOTE = 20000
+
+logger = logging.getLogger(__name__)
+
+RE_PARTE = re.compile(r"-(\d+)-(\d+)\.parquet$")
+
+TIEMPO = pa.timestamp("s", tz="UTC")
+ESQUEMAS = {
+    "evaluaciones": pa.schema([
+        ("id", pa.int64()),
+        ("creado_en", TIEMPO),
+        ("cedula", pa.string()),
+        ("perfil_hash", pa.string()),
+        ("modelo", pa.string()),
+        ("origen", pa.string()),
+        ("concepto", pa.string()),
+        ("cumple", pa.bool_()),
+        ("prefiltrada", pa.bool_()),
+        ("motivos", pa.list_(pa.string())),
+        ("meses_certificados", pa.float64()),
+        ("experiencias", pa.int32()),
+        ("documentos", pa.int32()),
+        ("t_cola", pa.float64()),
+        ("t_extraccion", pa.float64()),
+        ("t_modelo", pa.float64()),
+        ("llamadas", pa.int32()),
+        ("tokens_entrada", pa.int64()),
+        ("tokens_salida", pa.int64()),
+        ("costo_usd", pa.float64()),
+    ]),
+    "experiencias": pa.schema([
+        ("evaluacion_id", pa.int64()),
+        ("orden", pa.int32()),
+        ("creado_en", TIEMPO),
+        ("perfil_hash", pa.string()),
+        ("empresa", pa.string()),
+        ("fecha_inicio", pa.string()),
+        ("fecha_fin", pa.string()),
+        ("meses", pa.float64()),
+        ("dias", pa.float64()),
+        ("validada", pa.bool_()),
+    ]),
+}
+# Columnas que identifican una fila (para descartar duplicados de una exportación repetida)
+CLAVES = {"evaluaciones": ["id"], "experiencias": ["evaluacion_id", "orden"]}
+
+# Motivos de rechazo: las mismas reglas del prefiltro (prefiltro.py) y "otro".
+# Para las evaluaciones del modelo se clasifican las filas NO CUMPLE de su
+# tabla de cumplimiento (o, si no hay tabla, la conclusión) por palabras clave.
+MOTIVOS = [
+    ("tarjeta", re.compile(r"tarjeta|matr[íi]cula profesional|copnia", re.IGNORECASE)),
+    ("experiencia", re.compile(r"experiencia|meses|certificaci[óo]n laboral", re.IGNORECASE)),
+    ("titulo", re.compile(r"t[íi]tulo|formaci[óo]n|profesional en|tecn[óo]log|diploma|acta de grado", re.IGNORECASE)),
+]
+RE_FILA_NO_CUMPLE = re.compile(r"^\|(.*\bNO CUMPLE\b.*)\|\s*$", re.MULTILINE | re.IGNORECASE)
+
+
+# --- Filas planas a partir del almacén ---
+def _numero(valor):
+    """12, "12", "12 meses" o "12,5" -> float; None si no hay número."""
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    encontrado = re.search(r"-?\d+(?:[.,]\d+)?", str(valor or ""))
+    return float(encontrado.group().replace(",", ".")) if encontrado else None
+
+
+def _cumple(concepto):
+    if not concepto:
+        return None
+    concepto = concepto.upper()
+    return "NO " not in concepto and ("CUMPLE" in concepto or "APTO" in concepto)
+
+
+def _clasificar(texto):
+    return [motivo for motivo, patron in MOTIVOS if patron.search(texto)] or ["otro"]
+
+
+def motivos_rechazo(resultado, cumple):
+    """Motivos de un NO CUMPLE: reglas del prefiltro o filas NO CUMPLE del análisis."""
+    if cumple is not False or not isinstance(resultado, dict):
+        return []
+    prefiltro = resultado.get("prefiltro") or {}
+    if prefiltro.get("reglas"):
+        return sorted({r["regla"] for r in prefiltro["reglas"]})
+    # Streamlit y la línea de comandos: JSON del modelo; Flask: informe en Markdown
+    analisis = resultado.get("analisis_detallado_markdown") or resultado.get("analisis") or ""
+    filas = RE_FILA_NO_CUMPLE.findall(analisis)
+    if filas:
+        return sorted({m for fila in filas for m in _clasificar(fila)})
+    return _clasificar(resultado.get("idoneidad_texto") or analisis)
+
+
+def _validada(valor):
+    if isinstance(valor, bool):
+        return valor
+    return str(valor or "").strip().upper() in ("SI", "SÍ", "S", "TRUE", "1")
+
+
+def _filas(registro):
+    """(fila de evaluaciones, filas de experiencias) de un registro del almacén."""
+    resultado = json.loads(registro["resultado"]) if registro["resultado"] else {}
+    tiempos = json.loads(registro["tiempos"]) if registro["tiempos"] else {}
+    documentos = json.loads(registro["documentos"]) if registro["documentos"] else []
+    consumo = json.loads(registro["consumo"]) if registro["consumo"] else {}
+    creado_en = datetime.fromisoformat(registro["creado_en"])
+    cumple = _cumple(registro["concepto"])
+
+    experiencias = []
+    lista = resultado.get("experiencia_lista") if isinstance(resultado, dict) else None
+    for orden, exp in enumerate(lista or []):
+        if not isinstance(exp, dict):
+            continue
+        experiencias.append({
+            "evaluacion_id": registro["id"],
+            "orden": orden,
+            "creado_en": creado_en,
+            "perfil_hash": registro["perfil_hash"],
+            "empresa": exp.get("empresa"),
+            "fecha_inicio": exp.get("fecha_inicio"),
+            "fecha_fin": exp.get("fecha_fin"),
+            "meses": _numero(exp.get("meses")),
+            "dias": _numero(exp.get("dias")),
+            "validada": _validada(exp.get("validada")),
+        })
+    # Meses certificados: solo las experiencias validadas (lista vacía = 0; sin lista
+    # o descartada por el prefiltro, que no lee la experiencia = desconocido)
+    meses = None
+    if lista is not None and registro["modelo"] != "prefiltro":
+        meses = sum((e["meses"] or 0) + (e["dias"] or 0) / 30 for e in experiencias if e["validada"])
+
+    evaluacion = {
+        "id": registro["id"],
+        "creado_en": creado_en,
+        "cedula": registro["cedula"],
+        "perfil_hash": registro["perfil_hash"],
+        "modelo": registro["modelo"],
+        "origen": registro["origen"],
+        "concepto": registro["concepto"],
+        "cumple": cumple,
+        "prefiltrada": registro["modelo"] == "prefiltro",
+        "motivos": motivos_rechazo(resultado, cumple),
+        "meses_certificados": meses,
+        "experiencias": len(experiencias) if lista is not None else None,
+        "documentos": len(documentos),
+        "t_cola": tiempos.get("cola"),
+        "t_extraccion": tiempos.get("extraccion"),
+        "t_modelo": tiempos.get("modelo"),
+        "llamadas": consumo.get("llamadas"),
+        "tokens_entrada": consumo.get("tokens_entrada"),
+        "tokens_salida": consumo.get("tokens_salida"),
+        "costo_usd": consumo.get("costo_usd"),
+    }
+    return evaluacion, experiencias
+
+
+# --- Archivos ---
+@contextmanager
+def _bloqueo(directorio):
+    """Un solo exportador o compactador a la vez (Flask, Streamlit y la línea de comandos comparten carpeta)."""
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, ".bloqueo"), "w") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _particion(directorio, tabla, anio, mes):
+    return os.path.join(directorio, tabla, f"anio={anio}", f"mes={mes}")
+
+
+def _partes(carpeta):
+    if not os.path.isdir(carpeta):
+        return []
+    return sorted(os.path.join(carpeta, a) for a in os.listdir(carpeta) if RE_PARTE.search(a))
+
+
+def _escribir(tabla_arrow, carpeta, nombre):
+    # Escritura atómica: los lectores nunca ven un archivo a medias
+    os.makedirs(carpeta, exist_ok=True)
+    temporal = os.path.join(carpeta, f".{uuid.uuid4().hex}.tmp")
+    pq.write_table(tabla_arrow, temporal, compression="zstd")
+    os.replace(temporal, os.path.join(carpeta, nombre))
+
+
+def ultima_marca(directorio=None):
+    """Mayor id de evaluación ya exportado (0 si no hay exportaciones)."""
+    raiz = os.path.join(directorio or ANALITICA_DIR, "evaluaciones")
+    marca = 0
+    for carpeta, _, archivos in os.walk(raiz):
+        for archivo in archivos:
+            encontrado = RE_PARTE.search(archivo)
+            if encontrado:
+                marca = max(marca, int(encontrado.group(2)))
+    return marca
+
+
+def exportar(db_path=None, directorio=None):
+    """Agrega al Parquet las evaluaciones nuevas del almacén; retorna cuántas exportó."""
+    directorio = directorio or ANALITICA_DIR
+    exportadas = 0
+    with _bloqueo(directorio):
+        marca = ultima_marca(directorio)
+        conn = conexion(db_path)
+        while True:
+            registros = conn.execute(
+                "SELECT * FROM evaluaciones WHERE id > ? ORDER BY id LIMIT ?", (marca, FILAS_POR_LOTE),
+            ).fetchall()
+            if not registros:
+                break
+            particiones = {}
+            for registro in registros:
+                evaluacion, experiencias = _filas(registro)
+                clave = (evaluacion["creado_en"].year, evaluacion["creado_en"].month)
+                filas = particiones.setdefault(clave, {"evaluaciones": [], "experiencias": []})
+                filas["evaluaciones"].append(evaluacion)
+                filas["experiencias"].extend(experiencias)
+
+            for (anio, mes), filas in particiones.items():
+                ids = [e["id"] for e in filas["evaluaciones"]]
+                nombre = f"parte-{min(ids)}-{max(ids)}.parquet"
+                # Experiencias primero: la marca la dan los archivos de evaluaciones
+                for tabla in ("experiencias", "evaluaciones"):
+                    if filas[tabla]:
+                        _escribir(pa.Table.from_pylist(filas[tabla], schema=ESQUEMAS[tabla]),
+                                  _particion(directorio, tabla, anio, mes), nombre)
+                if len(_partes(_particion(directorio, "evaluaciones", anio, mes))) >= ANALITICA_MAX_PARTES:
+                    _compactar_particion(directorio, anio, mes)
+            marca = registros[-1]["id"]
+            exportadas += len(registros)
+    return exportadas
+
+
+def _compactar_particion(directorio, anio, mes):
+    for tabla in ESQUEMAS:
+        carpeta = _particion(directorio, tabla, anio, mes)
+        partes = _partes(carpeta)
+        if len(partes) < 2:
+            continue
+        datos = pq.read_table(partes, schema=ESQUEMAS[tabla]).to_pandas()
+        datos = datos.drop_duplicates(CLAVES[tabla], keep="last").sort_values(CLAVES[tabla])
+        rango = [(int(m.group(1)), int(m.group(2))) for m in map(RE_PARTE.search, partes)]
+        nombre = f"compacto-{min(r[0] for r in rango)}-{max(r[1] for r in rango)}.parquet"
+        _escribir(pa.Table.from_pandas(datos, schema=ESQUEMAS[tabla], preserve_index=False), carpeta, nombre)
+        for parte in partes:
+            if os.path.basename(parte) != nombre:
+                os.remove(parte)
+
+
+def compactar(directorio=None):
+    """Une los archivos de cada partición en uno solo; retorna las particiones compactadas."""
+    directorio = directorio or ANALITICA_DIR
+    compactadas = 0
+    with _bloqueo(directorio):
+        raiz = os.path.join(directorio, "evaluaciones")
+        for carpeta, _, _ in os.walk(raiz):
+            encontrado = re.search(r"anio=(\d+)[\\/]mes=(\d+)$", carpeta)
+            if encontrado and len(_partes(carpeta)) > 1:
+                _compactar_particion(directorio, int(encontrado.group(1)), int(encontrado.group(2)))
+                compactadas += 1
+    return compactadas
+
+
+# --- Exportación en segundo plano ---
+_programada = None
+_programada_lock = threading.Lock()
+
+
+def _exportar_programada(db_path):
+    global _programada
+    with _programada_lock:
+        _programada = None
+    try:
+        exportar(db_path)
+    except Exception as e:
+        logger.warning("No se pudo exportar la analítica: %s", e)
+
+
+def programar_exportacion(db_path=None):
+    """Exporta en ANALITICA_RETRASO_S segundos (una sola exportación por ventana)."""
+    global _programada
+    if not ANALITICA_AUTO:
+        return
+    with _programada_lock:
+        if _programada is None:
+            _programada = threading.Timer(ANALITICA_RETRASO_S, _exportar_programada, args=(db_path,))
+            _programada.daemon = True
+            _programada.start()
+
+
+# --- CONSULTAS (pandas) ---
+def _fecha(fecha):
+    return date.fromisoformat(fecha[:10]) if isinstance(fecha, str) else fecha
+
+
+def leer(tabla="evaluaciones", desde=None, hasta=None, columnas=None, directorio=None):
+    """DataFrame de una tabla analítica, filtrado por fecha ISO (AAAA-MM-DD, 'hasta' inclusivo).
+
+    Solo se leen las particiones (año, mes) del rango y las columnas pedidas.
+    """
+    raiz = os.path.join(directorio or ANALITICA_DIR, tabla)
+    if not os.path.isdir(raiz):
+        return pd.DataFrame(columns=columnas or ESQUEMAS[tabla].names)
+    esquema = ESQUEMAS[tabla].append(pa.field("anio", pa.int32())).append(pa.field("mes", pa.int32()))
+    dataset = ds.dataset(raiz, format="parquet", partitioning="hive", schema=esquema)
+
+    filtro = None
+    if desde:
+        inicio = _fecha(desde)
+        filtro = ((ds.field("anio") > inicio.year) |
+                  ((ds.field("anio") == inicio.year) & (ds.field("mes") >= inicio.month)))
+        filtro &= ds.field("creado_en") >= pa.scalar(datetime.combine(inicio, datetime.min.time()), TIEMPO)
+    if hasta:
+        fin = _fecha(hasta)
+        condicion = ((ds.field("anio") < fin.year) |
+                     ((ds.field("anio") == fin.year) & (ds.field("mes") <= fin.month)))
+        condicion &= ds.field("creado_en") < pa.scalar(datetime.combine(fin + timedelta(days=1), datetime.min.time()), TIEMPO)
+        filtro = condicion if filtro is None else filtro & condicion
+
+    leidas = list(dict.fromkeys((columnas or ESQUEMAS[tabla].names) + CLAVES[tabla]))
+    datos = dataset.to_table(columns=leidas, filter=filtro).to_pandas()
+    # Una exportación repetida tras una caída puede dejar filas duplicadas
+    datos = datos.drop_duplicates(CLAVES[tabla], keep="last")
+    return datos[columnas] if columnas else datos
+
+
+def tasa_cumple(desde=None, hasta=None, directorio=None):
+    """Evaluaciones, CUMPLE y tasa por perfil (hash de los requisitos)."""
+    datos = leer("evaluaciones", desde, hasta, ["perfil_hash", "cumple", "prefiltrada"], directorio)
+    return (datos.groupby("perfil_hash", dropna=False)
+            .agg(evaluaciones=("cumple", "size"), cumple=("cumple", "sum"),
+                 prefiltradas=("prefiltrada", "sum"), tasa_cumple=("cumple", "mean"))
+            .sort_values("evaluaciones", ascending=False))
+
+
+def meses_certificados(desde=None, hasta=None, directorio=None):
+    """Promedio y mediana de meses de experiencia validada por perfil."""
+    datos = leer("evaluaciones", desde, hasta, ["perfil_hash", "meses_certificados"], directorio)
+    return (datos.dropna(subset=["meses_certificados"])
+            .groupby("perfil_hash")["meses_certificados"]
+            .agg(evaluaciones="size", promedio="mean", mediana="median")
+            .sort_values("evaluaciones", ascending=False))
+
+
+def motivos_frecuentes(desde=None, hasta=None, limite=10, directorio=None):
+    """Motivos de NO CUMPLE más comunes, con la fracción de rechazos en que aparecen."""
+    datos = leer("evaluaciones", desde, hasta, ["cumple", "motivos"], directorio)
+    rechazos = datos[datos["cumple"] == False]  # noqa: E712 (columna con nulos)
+    conteo = rechazos["motivos"].explode().dropna().value_counts().head(limite)
+    return pd.DataFrame({"rechazos": conteo, "fraccion": (conteo / max(len(rechazos), 1)).round(4)})
+
+
+def latencia_y_costo(desde=None, hasta=None, directorio=None):
+    """Latencia del modelo, tokens y costo por evaluación, por modelo."""
+    datos = leer("evaluaciones", desde, hasta,
+                 ["modelo", "t_modelo", "tokens_entrada", "tokens_salida", "costo_usd"], directorio)
+    agrupado = datos.groupby("modelo")
+    return pd.DataFrame({
+        "evaluaciones": agrupado.size(),
+        "t_modelo_p50": agrupado["t_modelo"].median(),
+        "t_modelo_p95": agrupado["t_modelo"].quantile(0.95),
+        "tokens_entrada": agrupado["tokens_entrada"].mean(),
+        "tokens_salida": agrupado["tokens_salida"].mean(),
+        "costo_promedio_usd": agrupado["costo_usd"].mean(),
+        "costo_total_usd": agrupado["costo_usd"].sum(),
+    }).sort_values("evaluaciones", ascending=False)
+
+
+def reporte_mensual(anio, mes, directorio=None):
+    """Las cuatro consultas de gestión para un mes: dict de DataFrames."""
+    desde = date(anio, mes, 1)
+    hasta = date(anio + mes // 12, mes % 12 + 1, 1) - timedelta(days=1)
+    return {
+        "tasa_cumple": tasa_cumple(desde, hasta, directorio),
+        "meses_certificados": meses_certificados(desde, hasta, directorio),
+        "motivos_rechazo": motivos_frecuentes(desde, hasta, directorio=directorio),
+        "latencia_y_costo": latencia_y_costo(desde, hasta, directorio),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("accion", choices=["exportar", "compactar", "reporte"])
+    parser.add_argument("--db", help="Base SQLite (por defecto EVALUACIONES_DB)")
+    parser.add_argument("--dir", help="Carpeta Parquet (por defecto ANALITICA_DIR)")
+    parser.add_argument("--anio", type=int, default=date.today().year)
+    parser.add_argument("--mes", type=int, default=date.today().month)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    if args.accion == "exportar":
+        print(f"{exportar(args.db, args.dir)} evaluaciones exportadas")
+    elif args.accion == "compactar":
+        print(f"{compactar(args.dir)} particiones compactadas")
+    else:
+        with pd.option_context("display.width", 160, "display.max_columns", 20):
+            for titulo, tabla in reporte_mensual(args.anio, args.mes, args.dir).items():
+                print(f"\n=== {titulo} ({args.anio}-{args.mes:02d}) ===")
+                print(tabla.to_string() if len(tabla) else "(sin datos)")
+    print(f"({time.perf_counter() - inicio:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 import os
-from flask import Flask, request, jsonify, send_from_directory
+import time
+from flask import Flask, request, jsonify, send_from_directory, make_response
 from flask_cors import CORS
 import google.generativeai as genai
-from pypdf import PdfReader
+from motor import Motor, Solicitud, RequisitosFaltantes, EvaluacionRechazada, ejecutor_compartido
+from precarga import Precarga, DocumentosVencidos, DocumentoMuyGrande, PrecargaSaturada
+from admision import Admision, Rechazada, clave_revisor, estimar_trabajo
+import perfilado
+import consultas
 
 app = Flask(__name__, static_folder='.') # Ajuste para servir index.html si es necesario
-CORS(app)
+CORS(app, expose_headers=["X-Perfilado", "Retry-After"])
 
 # CONFIGURACIÓN API KEY
 # En entornos Google, lo ideal es usar Secret Manager o Variables de Entorno.
@@ -13,42 +18,13 @@ CORS(app)
 API_KEY = os.environ.get("GOOGLE_API_KEY", "TU_API_KEY_AQUI")
 genai.configure(api_key=API_KEY)
 
-# --- SISTEMA EXPERTO SENA CIES ---
-sena_instruction = """
-Eres el Auditor de Contratación del SENA (Regional Huila).
-Tu misión es validar rigurosamente si un candidato cumple con los requisitos para ser Instructor.
-
-INSTRUCCIONES DE VALIDACIÓN:
-1.  Analiza DETALLADAMENTE los "REQUISITOS DEL PERFIL" proporcionados.
-2.  Revisa UNO A UNO los "DOCUMENTOS APORTADOS" (Soportes).
-3.  Para cada requisito, busca la evidencia correspondiente en los soportes.
-4.  Determina si el candidato "CUMPLE" o "NO CUMPLE" con cada requisito específico.
-5.  Justifica tu decisión citando el documento y la página (si es posible) donde se encuentra la evidencia.
-6.  Si un requisito no tiene soporte, marca "NO CUMPLE" y explica que falta la evidencia.
-
-FORMATO DE SALIDA (Markdown):
--   Resumen del Perfil: Breve descripción del cargo.
--   Tabla de Cumplimiento:
-    | Requisito | Estado (CUMPLE / NO CUMPLE) | Justificación / Evidencia |
-    | :--- | :---: | :--- |
-    | ... | ... | ... |
--   Conclusión Final: Párrafo indicando si el candidato es APTO o NO APTO para contratación, basado en si cumple TODOS los requisitos críticos.
-"""
-
-model = genai.GenerativeModel(
-    model_name="gemini-1.5-pro",
-    generation_config={"temperature": 0.2},
-    system_instruction=sena_instruction
-)
-
-def extraer_texto_pdf(file_storage):
-    try:
-        reader = PdfReader(file_storage)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
-    except: return "[Error leyendo PDF]"
+# Motor de evaluación (ver motor.py). La extracción anticipada de los PDFs que
+# el usuario va eligiendo (ver precarga.py) usa el mismo ejecutor.
+motor = Motor("auditoria")
+precarga = Precarga(ejecutor_compartido())
+
+# Control de admisión: cola acotada y turnos justos por revisor (ver admision.py)
+admision = Admision()
 
 # RUTA PARA SERVIR EL FRONTEND (Importante para despliegue unificado)
 @app.route('/')
@@ -58,50 +34,121 @@ def index():
 @app.route('/api/validar-contratacion', methods=['POST'])
 def validar_contratacion():
     try:
+        llegada = time.perf_counter()
+
         # Recolección de datos
         nombre = request.form.get('nombre')
         id_aspirante = request.form.get('identificacion')
         requisitos_texto = request.form.get('requisitos')
         requisitos_pdf = request.files.get('requisitos_pdf') # Nuevo: PDF de requisitos
         archivos = request.files.getlist('soportes')
+        tokens = request.form.getlist('documentos') # Soportes ya subidos a /api/documentos
+        requisitos_token = request.form.get('requisitos_token')
 
-        if not archivos:
+        if not archivos and not tokens:
             return jsonify({"error": "Debes subir los archivos soporte (PDFs)."}), 400
 
-        # Procesar Requisitos (Texto o PDF)
-        texto_requisitos = ""
-        if requisitos_pdf:
-            texto_requisitos += f"--- REQUISITOS (Desde PDF: {requisitos_pdf.filename}) ---\n"
-            texto_requisitos += extraer_texto_pdf(requisitos_pdf) + "\n"
-        
-        if requisitos_texto:
-             texto_requisitos += f"\n--- REQUISITOS (Texto Adicional) ---\n{requisitos_texto}\n"
-
-        if not texto_requisitos.strip():
-             return jsonify({"error": "Debes proporcionar los requisitos (Texto o PDF)."}), 400
-
-        # Procesamiento PDF Soportes
-        texto_evidencia = ""
-        for arch in archivos:
-            texto_evidencia += f"\n--- SOPORTE: {arch.filename} ---\n{extraer_texto_pdf(arch)}\n"
-
-        # Prompt
-        prompt = f"""
-        CANDIDATO: {nombre} (ID: {id_aspirante})
-        
-        === PERFIL REQUERIDO Y REQUISITOS ===
-        {texto_requisitos}
-        
-        === DOCUMENTOS APORTADOS (EVIDENCIA) ===
-        {texto_evidencia}
-        """
-
-        response = model.generate_content(prompt)
-        return jsonify({"analisis": response.text})
-
+        requisitos = (requisitos_pdf.filename, requisitos_pdf.read()) if requisitos_pdf else None
+        datos = [(arch.filename, arch.read()) for arch in archivos]
+
+        # Turno justo por revisor; si la cola está llena se responde 503 de inmediato
+        trabajo = (estimar_trabajo([data for _, data in datos] + ([requisitos[1]] if requisitos else []))
+                   + precarga.trabajo(tokens + ([requisitos_token] if requisitos_token else [])))
+        with admision.turno(clave_revisor(request.headers, request.remote_addr), trabajo):
+            # Perfilado bajo demanda (cabecera X-Perfilar): no incluye la espera en la cola
+            with perfilado.perfilar(f"flask {id_aspirante}", perfilado.solicitado(request.headers)) as perfil:
+                respuesta = make_response(_auditar(nombre, id_aspirante, requisitos_texto, requisitos,
+                                                   datos, tokens, requisitos_token, llegada))
+            if perfil:
+                respuesta.headers["X-Perfilado"] = perfil.id
+            return respuesta
+
+    except Rechazada as e:
+        return (jsonify({"error": e.motivo, "reintentar_en": e.reintentar_en}), 503,
+                {"Retry-After": str(e.reintentar_en)})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _auditar(nombre, id_aspirante, requisitos_texto, requisitos, datos, tokens, requisitos_token, llegada):
+    """Extracción, prefiltro, modelo y registro de una solicitud ya admitida."""
+    inicio = time.perf_counter()
+
+    # Documentos precargados: su extracción ya corrió (o está por terminar)
+    try:
+        precargados = precarga.resolver(tokens + ([requisitos_token] if requisitos_token else []))
+    except DocumentosVencidos as e:
+        return jsonify({"error": "Algunos documentos ya no están en el servidor; vuelva a subirlos.",
+                        "tokens_vencidos": e.tokens}), 410
+    requisitos_precargado = precargados.pop() if requisitos_token else None
+
+    try:
+        ev = motor.ejecutar(Solicitud(
+            nombre, id_aspirante,
+            documentos=[(nombre_arch, "application/pdf", data) for nombre_arch, data in datos],
+            precargados=precargados,
+            requisitos_texto=requisitos_texto,
+            requisitos_pdf=requisitos,
+            requisitos_precargado=requisitos_precargado,
+            origen="flask",
+            tiempos={"cola": round(inicio - llegada, 3)},
+        ))
+    except RequisitosFaltantes as e:
+        return jsonify({"error": str(e)}), 400
+    except EvaluacionRechazada as e:
+        return jsonify({"error": str(e), "preflight": e.ruta}), 413
+    for aviso in ev.avisos:
+        app.logger.warning(aviso)
+
+    return jsonify({"analisis": ev.resultado, "omitidos": ev.omitidos, "preflight": ev.ruta,
+                    "prefiltro": ev.fallos})
+
+@app.route('/api/documentos', methods=['POST'])
+def subir_documento():
+    """Recibe un PDF apenas se elige y empieza a extraerlo; retorna su token."""
+    archivo = request.files.get('archivo')
+    if not archivo:
+        return jsonify({"error": "Debes enviar el archivo (campo 'archivo')."}), 400
+    try:
+        token, doc_hash = precarga.subir(archivo.filename, archivo.read())
+    except DocumentoMuyGrande as e:
+        return jsonify({"error": str(e)}), 413
+    except PrecargaSaturada as e:
+        return (jsonify({"error": str(e), "reintentar_en": e.reintentar_en}), 503,
+                {"Retry-After": str(e.reintentar_en)})
+    return jsonify({"token": token, "hash": doc_hash, "nombre": archivo.filename})
+
+# Consultas de solo lectura, compartidas con app_asgi.py (ver consultas.py)
+def _responder(cuerpo, estado, cabeceras):
+    return (cuerpo if isinstance(cuerpo, str) else jsonify(cuerpo)), estado, cabeceras
+
+@app.route('/api/evaluaciones/<cedula>', methods=['GET'])
+def evaluaciones_por_cedula(cedula):
+    return _responder(*consultas.evaluaciones_por_cedula(cedula, request.args))
+
+@app.route('/api/evaluaciones', methods=['GET'])
+def evaluaciones():
+    return _responder(*consultas.evaluaciones(request.args))
+
+@app.route('/api/admision/metricas', methods=['GET'])
+def metricas_admision():
+    return jsonify(admision.metricas())
+
+@app.route('/api/perfilados/<perfilado_id>', methods=['GET'])
+def descargar_perfilado(perfilado_id):
+    return _responder(*consultas.perfilado_guardado(perfilado_id, request.args))
+
+@app.route('/api/estadisticas/prefiltro', methods=['GET'])
+def estadisticas_del_prefiltro():
+    return _responder(*consultas.estadisticas_del_prefiltro(request.args))
+
+@app.route('/api/estadisticas/mensual', methods=['GET'])
+def estadisticas_mensuales():
+    return _responder(*consultas.estadisticas_mensuales(request.args))
+
+@app.route('/api/buscar-evidencia', methods=['GET'])
+def buscar_evidencia_historica():
+    return _responder(*consultas.buscar_evidencia_historica(request.args))
+
 if __name__ == '__main__':
     # Google Cloud inyecta el puerto en la variable de entorno PORT
     port = int(os.environ.get("PORT", 8080))
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import time
+from quart import Quart, request, jsonify, send_from_directory
+from quart_cors import cors
+import google.generativeai as genai
+from motor import Motor, Solicitud, RequisitosFaltantes, EvaluacionRechazada, ejecutor_compartido
+from precarga import Precarga, DocumentosVencidos, DocumentoMuyGrande, PrecargaSaturada
+from admision import Admision, Rechazada, clave_revisor, estimar_trabajo
+import consultas
+
+# --- MODO ASGI (asyncio) ---
+# Misma API que app.py, pero la espera a Gemini no ocupa un hilo: un solo
+# proceso mantiene cientos de evaluaciones en vuelo con memoria estable.
+# La extracción de PDFs (CPU) corre en los procesos aislados de
+# aislamiento.py; un hilo del ejecutor del motor (motor.py) espera cada
+# lectura para no bloquear el event loop.
+#
+#   uvicorn --host 0.0.0.0 --port 8080 app_asgi:app
+#
+# Un solo proceso de servidor: la extracción aislada crea procesos hijos, algo
+# que no se permite dentro de los workers daemon de hypercorn o gunicorn.
+#
+# El perfilado bajo demanda (X-Perfilar) es solo del modo hilos: aquí el
+# event loop atiende todas las solicitudes a la vez y sus pilas se
+# mezclarían. /api/perfilados sirve igual los perfilados ya guardados.
+
+app = Quart(__name__, static_folder='.')
+app = cors(app, allow_origin="*", expose_headers=["X-Perfilado", "Retry-After"])
+app.config["MAX_CONTENT_LENGTH"] = None # Igual que Flask: sin límite de tamaño
+
+API_KEY = os.environ.get("GOOGLE_API_KEY", "TU_API_KEY_AQUI")
+genai.configure(api_key=API_KEY)
+
+# Motor de evaluación, camino asíncrono (ver motor.py). La extracción
+# anticipada de los PDFs que el usuario va eligiendo (ver precarga.py) usa el
+# mismo ejecutor.
+motor = Motor("auditoria")
+precarga = Precarga(ejecutor_compartido())
+
+# Control de admisión (ver admision.py). Aquí las esperas al modelo no ocupan
+# hilos, así que los topes globales por defecto son mucho más altos que en Flask.
+admision = Admision(
+    max_en_curso=int(os.environ.get("ADMISION_MAX_EN_CURSO", 256)),
+    max_cola=int(os.environ.get("ADMISION_MAX_COLA", 512)),
+    max_trabajo_cola=int(os.environ.get("ADMISION_MAX_TRABAJO_COLA", 10000)),
+)
+
+@app.route('/')
+async def index():
+    # A diferencia de Flask, Quart no resuelve la carpeta contra root_path
+    return await send_from_directory(app.root_path, 'index.html')
+
+@app.route('/api/validar-contratacion', methods=['POST'])
+async def validar_contratacion():
+    try:
+        llegada = time.perf_counter()
+
+        # Recolección de datos
+        form = await request.form
+        files = await request.files
+        nombre = form.get('nombre')
+        id_aspirante = form.get('identificacion')
+        requisitos_texto = form.get('requisitos')
+        requisitos_pdf = files.get('requisitos_pdf')
+        archivos = files.getlist('soportes')
+        tokens = form.getlist('documentos') # Soportes ya subidos a /api/documentos
+        requisitos_token = form.get('requisitos_token')
+
+        if not archivos and not tokens:
+            return jsonify({"error": "Debes subir los archivos soporte (PDFs)."}), 400
+
+        requisitos = (requisitos_pdf.filename, requisitos_pdf.read()) if requisitos_pdf else None
+        datos = [(arch.filename, arch.read()) for arch in archivos]
+
+        # Turno justo por revisor; si la cola está llena se responde 503 de inmediato.
+        # La estimación recorre cada byte subido: fuera del event loop
+        trabajo = (await asyncio.to_thread(estimar_trabajo,
+                                           [data for _, data in datos] + ([requisitos[1]] if requisitos else []))
+                   + precarga.trabajo(tokens + ([requisitos_token] if requisitos_token else [])))
+        async with admision.turno_async(clave_revisor(request.headers, request.remote_addr), trabajo):
+            return await _auditar(nombre, id_aspirante, requisitos_texto, requisitos, datos, tokens,
+                                  requisitos_token, llegada)
+
+    except Rechazada as e:
+        return (jsonify({"error": e.motivo, "reintentar_en": e.reintentar_en}), 503,
+                {"Retry-After": str(e.reintentar_en)})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+async def _auditar(nombre, id_aspirante, requisitos_texto, requisitos, datos, tokens, requisitos_token, llegada):
+    """Extracción, prefiltro, modelo y registro de una solicitud ya admitida."""
+    inicio = time.perf_counter()
+
+    # Documentos precargados: su extracción ya corrió (o está por terminar)
+    try:
+        precargados = await precarga.resolver_async(tokens + ([requisitos_token] if requisitos_token else []))
+    except DocumentosVencidos as e:
+        return jsonify({"error": "Algunos documentos ya no están en el servidor; vuelva a subirlos.",
+                        "tokens_vencidos": e.tokens}), 410
+    requisitos_precargado = precargados.pop() if requisitos_token else None
+
+    # Cliente asíncrono de Gemini; la extracción y el historial, fuera del event loop
+    try:
+        ev = await motor.ejecutar_async(Solicitud(
+            nombre, id_aspirante,
+            documentos=[(nombre_arch, "application/pdf", data) for nombre_arch, data in datos],
+            precargados=precargados,
+            requisitos_texto=requisitos_texto,
+            requisitos_pdf=requisitos,
+            requisitos_precargado=requisitos_precargado,
+            origen="asgi",
+            tiempos={"cola": round(inicio - llegada, 3)},
+        ))
+    except RequisitosFaltantes as e:
+        return jsonify({"error": str(e)}), 400
+    except EvaluacionRechazada as e:
+        return jsonify({"error": str(e), "preflight": e.ruta}), 413
+    for aviso in ev.avisos:
+        app.logger.warning(aviso)
+
+    return jsonify({"analisis": ev.resultado, "omitidos": ev.omitidos, "preflight": ev.ruta,
+                    "prefiltro": ev.fallos})
+
+@app.route('/api/documentos', methods=['POST'])
+async def subir_documento():
+    """Recibe un PDF apenas se elige y empieza a extraerlo; retorna su token."""
+    archivo = (await request.files).get('archivo')
+    if not archivo:
+        return jsonify({"error": "Debes enviar el archivo (campo 'archivo')."}), 400
+    try:
+        # Hashea y estima el archivo completo: fuera del event loop
+        token, doc_hash = await asyncio.to_thread(precarga.subir, archivo.filename, archivo.read())
+    except DocumentoMuyGrande as e:
+        return jsonify({"error": str(e)}), 413
+    except PrecargaSaturada as e:
+        return (jsonify({"error": str(e), "reintentar_en": e.reintentar_en}), 503,
+                {"Retry-After": str(e.reintentar_en)})
+    return jsonify({"token": token, "hash": doc_hash, "nombre": archivo.filename})
+
+# Consultas de solo lectura, compartidas con app.py (ver consultas.py); leen
+# SQLite, Parquet o disco, así que corren fuera del event loop
+async def _responder(consulta, *args):
+    cuerpo, estado, cabeceras = await asyncio.to_thread(consulta, *args)
+    return (cuerpo if isinstance(cuerpo, str) else jsonify(cuerpo)), estado, cabeceras
+
+@app.route('/api/evaluaciones/<cedula>', methods=['GET'])
+async def evaluaciones_por_cedula(cedula):
+    return await _responder(consultas.evaluaciones_por_cedula, cedula, request.args)
+
+@app.route('/api/evaluaciones', methods=['GET'])
+async def evaluaciones():
+    return await _responder(consultas.evaluaciones, request.args)
+
+@app.route('/api/admision/metricas', methods=['GET'])
+async def metricas_admision():
+    return jsonify(admision.metricas())
+
+@app.route('/api/perfilados/<perfilado_id>', methods=['GET'])
+async def descargar_perfilado(perfilado_id):
+    return await _responder(consultas.perfilado_guardado, perfilado_id, request.args)
+
+@app.route('/api/estadisticas/prefiltro', methods=['GET'])
+async def estadisticas_del_prefiltro():
+    return await _responder(consultas.estadisticas_del_prefiltro, request.args)
+
+@app.route('/api/estadisticas/mensual', methods=['GET'])
+async def estadisticas_mensuales():
+    return await _responder(consultas.estadisticas_mensuales, request.args)
+
+@app.route('/api/buscar-evidencia', methods=['GET'])
+async def buscar_evidencia_historica():
+    return await _responder(consultas.buscar_evidencia_historica, request.args)
+
+if __name__ == '__main__':
+    port = int(os.environ.get("PORT", 8080))
+    app.run(host='0.0.0.0', port=port)
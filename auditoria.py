@@ -0,0 +1,155 @@
+import re
+import google.generativeai as genai
+from almacen import guardar_evaluacion
+from enrutamiento import preflight, resumir_soportes, resumir_soportes_async, sumar_consumo
+
+# --- AUDITORÍA EN MARKDOWN (variante "auditoria" de motor.py) ---
+# Lo propio del informe del auditor: instrucciones, armado del prompt,
+# llamada al modelo y registro en el historial. La lectura de soportes, la
+# deduplicación y el prefiltro los hace el motor (ver motor.py).
+
+# --- SISTEMA EXPERTO SENA CIES ---
+sena_instruction = """
+Eres el Auditor de Contratación del SENA (Regional Huila).
+Tu misión es validar rigurosamente si un candidato cumple con los requisitos para ser Instructor.
+
+INSTRUCCIONES DE VALIDACIÓN:
+1.  Analiza DETALLADAMENTE los "REQUISITOS DEL PERFIL" proporcionados.
+2.  Revisa UNO A UNO los "DOCUMENTOS APORTADOS" (Soportes).
+3.  Para cada requisito, busca la evidencia correspondiente en los soportes.
+4.  Determina si el candidato "CUMPLE" o "NO CUMPLE" con cada requisito específico.
+5.  Justifica tu decisión citando el documento y la página (si es posible) donde se encuentra la evidencia.
+6.  Si un requisito no tiene soporte, marca "NO CUMPLE" y explica que falta la evidencia.
+
+FORMATO DE SALIDA (Markdown):
+-   Resumen del Perfil: Breve descripción del cargo.
+-   Tabla de Cumplimiento:
+    | Requisito | Estado (CUMPLE / NO CUMPLE) | Justificación / Evidencia |
+    | :--- | :---: | :--- |
+    | ... | ... | ... |
+-   Conclusión Final: Párrafo indicando si el candidato es APTO o NO APTO para contratación, basado en si cumple TODOS los requisitos críticos.
+"""
+
+MODELO = "gemini-1.5-pro"
+
+_modelos = {}
+
+def crear_modelo(modelo=MODELO):
+    """Modelo con las instrucciones del auditor (uno por nombre de modelo)."""
+    if modelo not in _modelos:
+        _modelos[modelo] = genai.GenerativeModel(
+            model_name=modelo,
+            generation_config={"temperature": 0.2},
+            system_instruction=sena_instruction
+        )
+    return _modelos[modelo]
+
+def formato_requisitos(nombre_pdf, texto_pdf, texto_adicional):
+    """Sección de requisitos del prompt: texto del PDF (si hay) y texto adicional."""
+    texto_requisitos = ""
+    if texto_pdf is not None:
+        texto_requisitos += f"--- REQUISITOS (Desde PDF: {nombre_pdf}) ---\n"
+        texto_requisitos += texto_pdf + "\n"
+    
+    if texto_adicional:
+         texto_requisitos += f"\n--- REQUISITOS (Texto Adicional) ---\n{texto_adicional}\n"
+    return texto_requisitos
+
+def armar_prompt(nombre, id_aspirante, texto_requisitos, unicos):
+    texto_evidencia = ""
+    for soporte in unicos:
+        texto_evidencia += f"\n--- SOPORTE: {soporte['nombre']} ---\n{soporte['texto']}\n"
+
+    return f"""
+        CANDIDATO: {nombre} (ID: {id_aspirante})
+        
+        === PERFIL REQUERIDO Y REQUISITOS ===
+        {texto_requisitos}
+        
+        === DOCUMENTOS APORTADOS (EVIDENCIA) ===
+        {texto_evidencia}
+        """
+
+def _sin_imagenes(soportes):
+    # El prompt de auditoría es solo texto: las imágenes no cuentan en el preflight
+    return [{**s, "imagen": None} for s in soportes]
+
+def planificar_auditoria(nombre, id_aspirante, texto_requisitos, unicos, consumo=None):
+    """Preflight local y, si hace falta, resumen por partes (map-reduce).
+
+    Retorna (ruta, prompt); prompt es None si la ruta es "rechazado".
+    consumo: dict donde se acumulan los tokens de los resúmenes (ver enrutamiento.sumar_consumo).
+    """
+    unicos = _sin_imagenes(unicos)
+    texto_base = sena_instruction + texto_requisitos
+    ruta = preflight(texto_base, unicos)
+    if ruta["modo"] == "rechazado":
+        return ruta, None
+    if ruta["modo"] == "fragmentado":
+        unicos = resumir_soportes(texto_requisitos, unicos, texto_base, consumo)
+    return ruta, armar_prompt(nombre, id_aspirante, texto_requisitos, unicos)
+
+async def planificar_auditoria_async(nombre, id_aspirante, texto_requisitos, unicos, consumo=None):
+    unicos = _sin_imagenes(unicos)
+    texto_base = sena_instruction + texto_requisitos
+    ruta = preflight(texto_base, unicos)
+    if ruta["modo"] == "rechazado":
+        return ruta, None
+    if ruta["modo"] == "fragmentado":
+        unicos = await resumir_soportes_async(texto_requisitos, unicos, texto_base, consumo)
+    return ruta, armar_prompt(nombre, id_aspirante, texto_requisitos, unicos)
+
+def generar_analisis(model, prompt, consumo=None):
+    response = model.generate_content(prompt)
+    sumar_consumo(consumo, model.model_name, response)
+    return response.text
+
+async def generar_analisis_async(model, prompt, consumo=None):
+    response = await model.generate_content_async(prompt)
+    sumar_consumo(consumo, model.model_name, response)
+    return response.text
+
+RE_CONCLUSION = re.compile(r"CONCLUSI[OÓ]N\s+FINAL")
+RE_NO_APTO = re.compile(r"\bNO\s+(?:ES\s+|RESULTA\s+|SE\s+CONSIDERA\s+)?APT[OA]\b")
+RE_APTO = re.compile(r"\bAPT[OA]\b")
+
+def concepto_de_analisis(analisis):
+    """Conclusión APTO / NO APTO a partir del informe en Markdown.
+
+    Se lee la sección "Conclusión Final" (la última, si hay varias) o, si el
+    informe no la trae, todo el texto. Las negaciones ("no es apto", "no
+    resulta apto") se revisan antes que el APTO suelto.
+    """
+    texto = (analisis or "").upper()
+    conclusiones = list(RE_CONCLUSION.finditer(texto))
+    if conclusiones:
+        texto = texto[conclusiones[-1].end():]
+    if RE_NO_APTO.search(texto):
+        return "NO APTO"
+    if RE_APTO.search(texto):
+        return "APTO"
+    return None
+
+def registrar_auditoria(nombre, id_aspirante, perfil_hash, analisis, omitidos, soportes,
+                        tiempos, origen, modelo=MODELO, prefiltro=None, consumo=None):
+    """Guarda la auditoría en el historial de evaluaciones.
+
+    perfil_hash: huella de los requisitos (ver almacen.hash_perfil).
+    prefiltro: reglas incumplidas si la resolvió el prefiltro local (ver prefiltro.py).
+    consumo: tokens y costo de las llamadas al modelo (ver enrutamiento.sumar_consumo).
+    """
+    resultado = {"analisis": analisis, "omitidos": omitidos}
+    if prefiltro:
+        resultado["prefiltro"] = {"reglas": prefiltro}
+    guardar_evaluacion(
+        cedula=id_aspirante,
+        nombre=nombre,
+        perfil_hash=perfil_hash,
+        modelo=modelo,
+        resultado=resultado,
+        concepto=concepto_de_analisis(analisis),
+        tiempos=tiempos,
+        documentos=[{"nombre": s["nombre"], "hash": s["hash"]} for s in soportes],
+        origen=origen,
+        consumo=consumo,
+    )
@@ -0,0 +1,129 @@
+"""Prueba de carga de /api/validar-contratacion (modo hilos vs. modo ASGI).
+
+Levante el servidor con latencia de modelo simulada para no consumir cuota:
+
+    LATENCIA_SIMULADA_S=5 gunicorn --bind :8080 --workers 1 --threads 8 app:app
+    LATENCIA_SIMULADA_S=5 uvicorn --port 8081 --no-access-log app_asgi:app
+
+y lance la misma carga contra cada uno:
+
+    python bench_carga.py http://localhost:8080 --soporte cert.pdf -n 400 -c 200 --pid <PID>
+
+Reporta throughput, percentiles de latencia, errores, rechazos del control de
+admisión (503) y, si se indica el PID del servidor, el RSS máximo observado
+durante la prueba (Linux).
+
+El servidor solo respeta X-Revisor si se levanta con ADMISION_CLAVE_REVISOR
+y la carga envía la misma clave (--clave-revisor o la misma variable); si
+no, todas las solicitudes cuentan como un solo revisor (la IP local).
+
+Para probar la equidad entre revisores, lance a la vez una carga pesada y una
+liviana con distinto --revisor y compare los percentiles de la liviana:
+
+    python bench_carga.py URL --soporte hv.pdf --copias 40 --revisor lote -n 40 -c 20 &
+    python bench_carga.py URL --soporte cert.pdf --revisor ana -n 40 -c 2
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+def cuerpo_multipart(campos, archivos):
+    limite = uuid.uuid4().hex
+    partes = []
+    for nombre, valor in campos.items():
+        partes.append(f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"\r\n\r\n{valor}\r\n'.encode())
+    for nombre, ruta in archivos:
+        with open(ruta, "rb") as f:
+            data = f.read()
+        cabecera = (f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"; '
+                    f'filename="{os.path.basename(ruta)}"\r\nContent-Type: application/pdf\r\n\r\n')
+        partes.append(cabecera.encode() + data + b"\r\n")
+    partes.append(f"--{limite}--\r\n".encode())
+    return b"".join(partes), f"multipart/form-data; boundary={limite}"
+
+
+def rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1])
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("url", help="URL base del servidor, ej. http://localhost:8080")
+    parser.add_argument("--soporte", action="append", required=True, help="PDF soporte (repetible)")
+    parser.add_argument("-n", "--solicitudes", type=int, default=100)
+    parser.add_argument("-c", "--concurrencia", type=int, default=50)
+    parser.add_argument("--copias", type=int, default=1, help="Repetir los soportes N veces por solicitud")
+    parser.add_argument("--revisor", help="Cabecera X-Revisor (por defecto, uno distinto por solicitud)")
+    parser.add_argument("--clave-revisor", default=os.environ.get("ADMISION_CLAVE_REVISOR", ""),
+                        help="X-Revisor-Clave; sin ella el servidor ignora X-Revisor (ADMISION_CLAVE_REVISOR)")
+    parser.add_argument("--pid", type=int, help="PID del servidor para medir memoria")
+    args = parser.parse_args()
+
+    body, content_type = cuerpo_multipart(
+        {"nombre": "Prueba Carga", "identificacion": "123456789",
+         "requisitos": "Profesional en Ingeniería Civil con 24 meses de experiencia."},
+        [("soportes", ruta) for ruta in args.soporte] * args.copias,
+    )
+    url = args.url.rstrip("/") + "/api/validar-contratacion"
+
+    def solicitud(i):
+        inicio = time.perf_counter()
+        revisor = args.revisor or f"carga-{i}"
+        req = urllib.request.Request(url, data=body, headers={"Content-Type": content_type,
+                                                               "X-Revisor": revisor,
+                                                               "X-Revisor-Clave": args.clave_revisor})
+        try:
+            with urllib.request.urlopen(req, timeout=600) as resp:
+                resp.read()
+                estado = resp.status
+        except urllib.error.HTTPError as e:
+            estado = e.code
+        except Exception:
+            estado = None
+        return estado, time.perf_counter() - inicio
+
+    rss_max = [0]
+    terminado = threading.Event()
+
+    def medir_memoria():
+        while not terminado.wait(0.2):
+            rss_max[0] = max(rss_max[0], rss_kb(args.pid) or 0)
+
+    if args.pid:
+        threading.Thread(target=medir_memoria, daemon=True).start()
+        rss_inicial = rss_kb(args.pid)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrencia) as pool:
+        resultados = list(pool.map(solicitud, range(args.solicitudes)))
+    total = time.perf_counter() - inicio
+    terminado.set()
+
+    latencias = sorted(t for estado, t in resultados if estado == 200)
+    rechazadas = sum(1 for estado, _ in resultados if estado == 503)
+    errores = len(resultados) - len(latencias) - rechazadas
+    print(f"solicitudes={args.solicitudes} concurrencia={args.concurrencia} errores={errores} "
+          f"rechazadas(503)={rechazadas}")
+    print(f"duración={total:.2f}s throughput={args.solicitudes / total:.2f} req/s")
+    if latencias:
+        q = statistics.quantiles(latencias, n=100) if len(latencias) > 1 else latencias * 99
+        print(f"latencia p50={q[49]:.2f}s p95={q[94]:.2f}s p99={q[98]:.2f}s max={latencias[-1]:.2f}s")
+    if args.pid:
+        print(f"RSS inicial={rss_inicial} kB máximo={rss_max[0]} kB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Compara los backends de extracción de texto de PDF sobre documentos reales.
+
+    python bench_extractores.py soportes/*.pdf --repeticiones 5
+
+Por cada backend instalado reporta el tiempo total y por documento, los
+caracteres extraídos y los documentos que no pudo leer. Úselo con soportes
+representativos (certificaciones laborales, diplomas, actas, hojas de vida
+largas) para decidir el valor de PDF_BACKEND.
+"""
+import argparse
+import statistics
+import time
+
+from extractores import BACKENDS, MAX_PAGINAS_PDF, backends_disponibles
+
+
+def medir(backend, documentos, repeticiones):
+    tiempos, caracteres, fallidos = [], 0, []
+    for nombre, data in documentos:
+        muestras = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            try:
+                paginas, _ = BACKENDS[backend](data, MAX_PAGINAS_PDF)
+            except Exception as e:
+                fallidos.append(f"{nombre} ({e})")
+                break
+            muestras.append(time.perf_counter() - inicio)
+        else:
+            tiempos.append(statistics.median(muestras))
+            caracteres += sum(len(p) for p in paginas)
+    return tiempos, caracteres, fallidos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdfs", nargs="+", help="PDFs de prueba")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Se toma la mediana por documento")
+    parser.add_argument("--backend", action="append", help="Limitar a estos backends (repetible)")
+    args = parser.parse_args()
+
+    documentos = []
+    for ruta in args.pdfs:
+        with open(ruta, "rb") as f:
+            documentos.append((ruta, f.read()))
+
+    backends = args.backend or backends_disponibles()
+    print(f"{len(documentos)} documentos, {sum(len(d) for _, d in documentos) / 1024:.0f} KB")
+    print(f"{'backend':<10}{'total (s)':>11}{'ms/doc':>10}{'p95 ms':>10}{'caracteres':>12}  fallidos")
+    for backend in backends:
+        tiempos, caracteres, fallidos = medir(backend, documentos, args.repeticiones)
+        if tiempos:
+            p95 = statistics.quantiles(tiempos, n=20)[18] if len(tiempos) > 1 else tiempos[0]
+            print(f"{backend:<10}{sum(tiempos):>11.3f}{1000 * statistics.mean(tiempos):>10.1f}"
+                  f"{1000 * p95:>10.1f}{caracteres:>12}  {len(fallidos)}")
+        else:
+            print(f"{backend:<10}{'-':>11}{'-':>10}{'-':>10}{'-':>12}  {len(fallidos)}")
+        for fallido in fallidos:
+            print(f"    {fallido}")
+
+
+if __name__ == "__main__":
+    main()
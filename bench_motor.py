@@ -0,0 +1,92 @@
+"""Compara los ejecutores del motor de evaluación (motor.py) etapa por etapa.
+
+    python bench_motor.py soportes/*.pdf --evaluaciones 20 --concurrencia 4 --latencia 2
+
+Cada evaluación lleva los mismos soportes (sin caché de extracción, para medir
+la extracción cada vez) y una latencia de modelo simulada, así que no consume
+cuota. Por ejecutor reporta el tiempo total, las evaluaciones por segundo y la
+mediana de cada etapa. Antes de medir se hace una evaluación de calentamiento
+(arranque de los procesos de extracción). El historial se escribe en una base
+temporal.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("EVALUACIONES_DB", os.path.join(tempfile.mkdtemp(prefix="bench_motor_"), "bench.db"))
+os.environ.setdefault("ANALITICA_AUTO", "0")
+
+import motor  # noqa: E402
+
+TIPOS = {".pdf": "application/pdf", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
+
+
+def solicitud(documentos, i):
+    return motor.Solicitud(f"Candidato {i}", str(1000000 + i), documentos=documentos,
+                           requisitos_texto="Técnico o tecnólogo con 24 meses de experiencia certificada.",
+                           origen="bench", prefiltro="apagado")
+
+
+def medir(nombre, variante, documentos, evaluaciones, concurrencia, trabajadores, asincrono):
+    ejecutor = motor.crear_ejecutor(nombre, trabajadores)
+    m = motor.Motor(variante, ejecutor=ejecutor, cache=motor.CacheExtraccion(0))
+    try:
+        m.ejecutar(solicitud(documentos, -1))  # Calentamiento
+        inicio = time.perf_counter()
+        if asincrono:
+            async def lote():
+                cupos = asyncio.Semaphore(concurrencia)
+
+                async def una(i):
+                    async with cupos:
+                        return await m.ejecutar_async(solicitud(documentos, i))
+                return await asyncio.gather(*(una(i) for i in range(evaluaciones)))
+            resultados = asyncio.run(lote())
+        else:
+            with ThreadPoolExecutor(max_workers=concurrencia) as hilos:
+                resultados = list(hilos.map(lambda i: m.ejecutar(solicitud(documentos, i)), range(evaluaciones)))
+        total = time.perf_counter() - inicio
+    finally:
+        ejecutor.cerrar()
+    etapas = {e: statistics.median(ev.etapas.get(e, 0) for ev in resultados) for e in motor.ETAPAS}
+    return total, etapas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("soportes", nargs="+", help="Soportes de prueba (PDF, JPG, PNG)")
+    parser.add_argument("--evaluaciones", type=int, default=10)
+    parser.add_argument("--concurrencia", type=int, default=4, help="Evaluaciones simultáneas")
+    parser.add_argument("--trabajadores", type=int, default=motor.MOTOR_TRABAJADORES,
+                        help="Hilos o procesos de cada ejecutor")
+    parser.add_argument("--latencia", type=float, default=1.0, help="Segundos simulados de modelo")
+    parser.add_argument("--variante", choices=list(motor.VARIANTES), default="auditoria")
+    parser.add_argument("--ejecutor", action="append", help="Limitar a estos ejecutores (repetible)")
+    parser.add_argument("--asincrono", action="store_true", help="Usar el camino asíncrono (como app_asgi.py)")
+    args = parser.parse_args()
+
+    motor.LATENCIA_SIMULADA = args.latencia
+    documentos = []
+    for ruta in args.soportes:
+        tipo = TIPOS.get(os.path.splitext(ruta)[1].lower())
+        if tipo:
+            with open(ruta, "rb") as f:
+                documentos.append((os.path.basename(ruta), tipo, f.read()))
+
+    print(f"{len(documentos)} soportes por evaluación, {args.evaluaciones} evaluaciones, "
+          f"concurrencia {args.concurrencia}, modelo simulado {args.latencia} s")
+    print(f"{'ejecutor':<10}{'total (s)':>10}{'eval/s':>8}" + "".join(f"{e:>13}" for e in motor.ETAPAS))
+    for nombre in args.ejecutor or list(motor.EJECUTORES):
+        total, etapas = medir(nombre, args.variante, documentos, args.evaluaciones, args.concurrencia,
+                              args.trabajadores, args.asincrono)
+        print(f"{nombre:<10}{total:>10.2f}{args.evaluaciones / total:>8.2f}"
+              + "".join(f"{etapas[e]:>13.3f}" for e in motor.ETAPAS))
+    print("Etapas: mediana en segundos por evaluación.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import json
+
+import perfilado
+from almacen import buscar_por_cedula, listar_evaluaciones, buscar_evidencia, estadisticas_prefiltro
+
+# --- CONSULTAS DE SOLO LECTURA DE LA API ---
+# Las rutas GET son las mismas en app.py (Flask) y app_asgi.py (Quart): aquí
+# vive su lógica y cada servidor solo la envuelve. Cada función recibe los
+# parámetros de la URL (request.args, un MultiDict de werkzeug en ambos) y
+# retorna (cuerpo, estado, cabeceras): el cuerpo es un dict para responder
+# como JSON o un str para responder tal cual. Todas bloquean (SQLite,
+# Parquet, disco): app_asgi.py las corre fuera del event loop.
+
+
+def evaluaciones_por_cedula(cedula, args):
+    limite = args.get('limite', 20, type=int)
+    return {"evaluaciones": buscar_por_cedula(cedula, limite=limite)}, 200, {}
+
+
+def evaluaciones(args):
+    return {"evaluaciones": listar_evaluaciones(
+        perfil_hash=args.get('perfil'),
+        desde=args.get('desde'),
+        hasta=args.get('hasta'),
+        limite=args.get('limite', 100, type=int),
+    )}, 200, {}
+
+
+def perfilado_guardado(perfilado_id, args):
+    """Perfil de una solicitud con X-Perfilar; ?formato=plegado para flamegraph.pl / speedscope."""
+    resultado = perfilado.cargar(perfilado_id)
+    if resultado is None:
+        return {"error": "Perfilado no encontrado."}, 404, {}
+    if args.get('formato') == 'plegado':
+        return perfilado.pilas_plegadas(resultado), 200, {"Content-Type": "text/plain; charset=utf-8"}
+    return resultado, 200, {}
+
+
+def estadisticas_del_prefiltro(args):
+    return estadisticas_prefiltro(desde=args.get('desde'), hasta=args.get('hasta')), 200, {}
+
+
+def estadisticas_mensuales(args):
+    """Reporte de gestión de un mes desde la copia Parquet (ver analitica.py)."""
+    from analitica import reporte_mensual
+    anio = args.get('anio', type=int)
+    mes = args.get('mes', type=int)
+    if not anio or not mes or not 1 <= mes <= 12:
+        return {"error": "Debes indicar anio y mes (1-12)."}, 400, {}
+    # to_json convierte los NaN en null
+    return {nombre: json.loads(tabla.reset_index().to_json(orient="records", force_ascii=False))
+            for nombre, tabla in reporte_mensual(anio, mes).items()}, 200, {}
+
+
+def buscar_evidencia_historica(args):
+    terminos = args.get('q', '')
+    if not terminos.strip():
+        return {"error": "Debes indicar los términos a buscar (parámetro q)."}, 400, {}
+    return {"candidatos": buscar_evidencia(
+        terminos,
+        modo=args.get('modo', 'todos'),
+        limite=args.get('limite', 20, type=int),
+    )}, 200, {}
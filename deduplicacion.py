@@ -0,0 +1,119 @@
+import hashlib
+import re
+import unicodedata
+
+from pypdf import PdfReader
+
+# --- DETECCIÓN DE SOPORTES DUPLICADOS ---
+# Los aspirantes suelen subir el mismo certificado dos veces (el mismo archivo
+# con otro nombre, o el mismo contrato exportado de nuevo a PDF). Antes de armar el prompt se deja
+# un solo representante por grupo y se informa cuáles archivos se omitieron.
+# Dos textos solo son "casi idénticos" si además mencionan exactamente las
+# mismas cifras (fechas, números de contrato, valores): contratos de una misma
+# plantilla que cambian de año son experiencia distinta, no duplicados.
+# Las imágenes solo se omiten si el archivo es idéntico: un hash perceptual
+# no distingue dos fotos de certificados distintos (hoja blanca con texto
+# negro en el mismo formato) y sin OCR no hay cifras con qué confirmarlo.
+
+UMBRAL_SIMHASH = 3        # Bits distintos tolerados entre textos casi iguales (y mismas cifras)
+MIN_PALABRAS_SIMHASH = 20 # Textos más cortos no dan una huella confiable
+TAM_SHINGLE = 5
+MIN_CARACTERES_TEXTO = 50 # Por debajo de esto un PDF se trata como escaneado
+MINIATURA_PDF = 128       # Lado máximo (px) de la imagen que se guarda de un PDF escaneado
+
+
+def hash_contenido(data):
+    """Huella exacta (SHA-256) del contenido binario del archivo."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _palabras(texto):
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.findall(r"\w+", texto)
+
+
+def simhash_texto(texto, bits=64):
+    """SimHash sobre shingles de palabras. Devuelve None si el texto es muy corto."""
+    palabras = _palabras(texto or "")
+    if len(palabras) < MIN_PALABRAS_SIMHASH:
+        return None
+
+    pesos = [0] * bits
+    for i in range(len(palabras) - TAM_SHINGLE + 1):
+        shingle = " ".join(palabras[i:i + TAM_SHINGLE]).encode("utf-8")
+        h = int.from_bytes(hashlib.blake2b(shingle, digest_size=bits // 8).digest(), "big")
+        for b in range(bits):
+            pesos[b] += 1 if h >> b & 1 else -1
+
+    return sum(1 << b for b in range(bits) if pesos[b] > 0)
+
+
+def cifras_texto(texto):
+    """Conjunto de números que menciona el texto (fechas, consecutivos, valores)."""
+    return frozenset(re.findall(r"\d+", texto or ""))
+
+
+def distancia_hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def imagen_de_pdf(uploaded_file):
+    """Miniatura en grises de la primera imagen de un PDF escaneado.
+
+    Solo marca el PDF como escaneado (prefiltro, preflight): los PDF van al
+    modelo como texto. Un escaneo a 300 ppp decodificado ocupa ~26 MB; la
+    miniatura, unos pocos KB.
+    """
+    try:
+        uploaded_file.seek(0)
+        reader = PdfReader(uploaded_file)
+        imagenes = reader.pages[0].images
+        if not imagenes:
+            return None
+        imagen = imagenes[0].image.convert("L")
+        imagen.thumbnail((MINIATURA_PDF, MINIATURA_PDF))
+        return imagen
+    except Exception:
+        return None
+    finally:
+        uploaded_file.seek(0)
+
+
+def deduplicar_soportes(soportes):
+    """Agrupa soportes duplicados y deja un representante por grupo.
+
+    Cada soporte es un dict con 'nombre' y 'hash' (ver hash_contenido), y
+    opcionalmente 'texto' (texto extraído) y/o 'imagen' (PIL.Image). Se conserva
+    el primero de cada grupo en el orden recibido.
+
+    Retorna (unicos, omitidos); cada omitido es un dict con 'nombre',
+    'duplicado_de' y 'motivo' ("idéntico" o "texto casi idéntico").
+    """
+    unicos, omitidos = [], []
+    por_hash = {}
+    huellas_texto = []  # (simhash, cifras, nombre)
+
+    for soporte in soportes:
+        nombre = soporte["nombre"]
+
+        original = por_hash.get(soporte["hash"])
+        if original:
+            omitidos.append({"nombre": nombre, "duplicado_de": original, "motivo": "idéntico"})
+            continue
+
+        sh = simhash_texto(soporte.get("texto"))
+        cifras = cifras_texto(soporte.get("texto"))
+        if sh is not None:
+            similar = next((n for h, c, n in huellas_texto
+                            if c == cifras and distancia_hamming(h, sh) <= UMBRAL_SIMHASH), None)
+            if similar:
+                omitidos.append({"nombre": nombre, "duplicado_de": similar, "motivo": "texto casi idéntico"})
+                continue
+
+        por_hash[soporte["hash"]] = nombre
+        if sh is not None:
+            huellas_texto.append((sh, cifras, nombre))
+        unicos.append(soporte)
+
+    return unicos, omitidos
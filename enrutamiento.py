@@ -0,0 +1,204 @@
+import asyncio
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import google.generativeai as genai
+
+# --- PREFLIGHT DE TOKENS Y ENRUTAMIENTO DE MODELO ---
+# Antes de llamar al modelo se estima localmente el tamaño del prompt (sin
+# llamar a la API) y se decide:
+#   - "directo" con el modelo rápido si el candidato es pequeño,
+#   - "directo" con el modelo pro si es grande pero cabe en una llamada,
+#   - "fragmentado" (map-reduce): los soportes se resumen por partes con el
+#     modelo rápido y la evaluación final se hace sobre los resúmenes,
+#   - "rechazado" si ni fragmentando cabe; se informa de inmediato.
+# Los umbrales se configuran por variables de entorno.
+
+MODELO_RAPIDO = os.environ.get("MODELO_RAPIDO", "gemini-2.0-flash")
+MODELO_PRO = os.environ.get("MODELO_PRO", "gemini-1.5-pro")
+
+UMBRAL_TOKENS_RAPIDO = int(os.environ.get("UMBRAL_TOKENS_RAPIDO", 30000))
+UMBRAL_IMAGENES_RAPIDO = int(os.environ.get("UMBRAL_IMAGENES_RAPIDO", 8))
+LIMITE_TOKENS_LLAMADA = int(os.environ.get("LIMITE_TOKENS_LLAMADA", 200000))
+LIMITE_IMAGENES_LLAMADA = int(os.environ.get("LIMITE_IMAGENES_LLAMADA", 40))
+MAX_FRAGMENTOS = int(os.environ.get("MAX_FRAGMENTOS", 12))
+
+# Precio en USD por millón de tokens (entrada/salida), para el costo de cada
+# evaluación. Se sobrescribe con PRECIOS_GEMINI="modelo=entrada/salida,...".
+PRECIOS_POR_MILLON = {
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-pro": (1.25, 5.00),
+}
+for _par in filter(None, (p.strip() for p in os.environ.get("PRECIOS_GEMINI", "").split(","))):
+    _modelo, _, _precios = _par.partition("=")
+    _entrada, _, _salida = _precios.partition("/")
+    PRECIOS_POR_MILLON[_modelo.strip()] = (float(_entrada), float(_salida))
+
+CARACTERES_POR_TOKEN = 4   # Aproximación de Gemini para texto
+TOKENS_POR_TESELA = 258    # Gemini cobra las imágenes por teselas de 768x768
+TAM_TESELA = 768
+
+PROMPT_FRAGMENTO = """
+Eres asistente del Auditor de Contratación del SENA. Recibes UNA PARTE de los
+soportes de un candidato. No evalúes si cumple: solo extrae, citando el archivo,
+la evidencia relevante para el perfil:
+- Títulos (nivel, programa, institución, fecha de grado).
+- Tarjeta profesional (número, fecha, entidad, ej. COPNIA).
+- Certificaciones laborales: empresa, cargo, fecha de inicio y fin TAL COMO
+  aparecen (no completes fechas parciales).
+Responde en texto plano y conciso.
+"""
+
+
+def estimar_tokens_texto(texto):
+    return math.ceil(len(texto or "") / CARACTERES_POR_TOKEN)
+
+
+def estimar_tokens_imagen(image):
+    """Tokens de una imagen: 258 si es pequeña, 258 por tesela de 768 px si no."""
+    if image is None:
+        return 0
+    if max(image.width, image.height) <= 384:
+        return TOKENS_POR_TESELA
+    return math.ceil(image.width / TAM_TESELA) * math.ceil(image.height / TAM_TESELA) * TOKENS_POR_TESELA
+
+
+def tokens_soporte(soporte):
+    return estimar_tokens_texto(soporte.get("texto")) + estimar_tokens_imagen(soporte.get("imagen"))
+
+
+def sumar_consumo(consumo, modelo, response):
+    """Acumula en `consumo` los tokens que reporta Gemini (usage_metadata) y su costo.
+
+    consumo: dict de la evaluación, o None para no medir. Claves: llamadas,
+    tokens_entrada, tokens_salida, costo_usd (None si el modelo no tiene precio).
+    """
+    if consumo is None:
+        return
+    uso = getattr(response, "usage_metadata", None)
+    entrada = getattr(uso, "prompt_token_count", 0) or 0
+    salida = getattr(uso, "candidates_token_count", 0) or 0
+    consumo["llamadas"] = consumo.get("llamadas", 0) + 1
+    consumo["tokens_entrada"] = consumo.get("tokens_entrada", 0) + entrada
+    consumo["tokens_salida"] = consumo.get("tokens_salida", 0) + salida
+    precios = PRECIOS_POR_MILLON.get(modelo.removeprefix("models/"))
+    if precios is None or consumo.get("costo_usd", 0) is None:
+        consumo["costo_usd"] = None
+    else:
+        costo = (entrada * precios[0] + salida * precios[1]) / 1e6
+        consumo["costo_usd"] = round(consumo.get("costo_usd", 0) + costo, 6)
+
+
+def preflight(texto_base, soportes):
+    """Estima tokens e imágenes de una evaluación y decide la ruta.
+
+    texto_base: instrucciones + requisitos (todo lo que no son soportes).
+    Retorna un dict con 'tokens', 'imagenes', 'modo' ("directo",
+    "fragmentado" o "rechazado"), 'modelo' y 'motivo'.
+    """
+    tokens = estimar_tokens_texto(texto_base) + sum(tokens_soporte(s) for s in soportes)
+    imagenes = sum(1 for s in soportes if s.get("imagen") is not None)
+    ruta = {"tokens": tokens, "imagenes": imagenes}
+
+    if tokens <= UMBRAL_TOKENS_RAPIDO and imagenes <= UMBRAL_IMAGENES_RAPIDO:
+        return {**ruta, "modo": "directo", "modelo": MODELO_RAPIDO, "motivo": "Candidato pequeño"}
+
+    if tokens <= LIMITE_TOKENS_LLAMADA and imagenes <= LIMITE_IMAGENES_LLAMADA:
+        return {**ruta, "modo": "directo", "modelo": MODELO_PRO, "motivo": "Candidato grande"}
+
+    fragmentos = len(fragmentar_soportes(soportes, limite_fragmento(texto_base)))
+    if fragmentos <= MAX_FRAGMENTOS:
+        return {**ruta, "modo": "fragmentado", "modelo": MODELO_PRO, "fragmentos": fragmentos,
+                "motivo": f"Excede una llamada: se resume en {fragmentos} partes"}
+
+    return {**ruta, "modo": "rechazado", "modelo": None, "fragmentos": fragmentos,
+            "motivo": (f"Demasiado grande: ~{tokens} tokens y {imagenes} imágenes requieren "
+                       f"{fragmentos} partes (máximo {MAX_FRAGMENTOS}). Divida los soportes.")}
+
+
+def limite_fragmento(texto_base):
+    return LIMITE_TOKENS_LLAMADA - estimar_tokens_texto(texto_base + PROMPT_FRAGMENTO)
+
+
+def fragmentar_soportes(soportes, limite_tokens):
+    """Agrupa soportes en fragmentos que caben en una llamada.
+
+    Un texto que por sí solo excede el límite se parte en trozos
+    ("nombre (parte i/n)"). Cada fragmento respeta también el límite de
+    imágenes por llamada.
+    """
+    piezas = []
+    max_caracteres = max(limite_tokens, 1) * CARACTERES_POR_TOKEN
+    for soporte in soportes:
+        texto = soporte.get("texto") or ""
+        if len(texto) <= max_caracteres:
+            piezas.append(soporte)
+            continue
+        partes = math.ceil(len(texto) / max_caracteres)
+        for i in range(partes):
+            piezas.append({**soporte, "nombre": f"{soporte['nombre']} (parte {i + 1}/{partes})",
+                           "texto": texto[i * max_caracteres:(i + 1) * max_caracteres],
+                           "imagen": soporte.get("imagen") if i == 0 else None})
+
+    fragmentos, actual, tokens, imagenes = [], [], 0, 0
+    for pieza in piezas:
+        t = tokens_soporte(pieza)
+        i = 1 if pieza.get("imagen") is not None else 0
+        if actual and (tokens + t > limite_tokens or imagenes + i > LIMITE_IMAGENES_LLAMADA):
+            fragmentos.append(actual)
+            actual, tokens, imagenes = [], 0, 0
+        actual.append(pieza)
+        tokens += t
+        imagenes += i
+    if actual:
+        fragmentos.append(actual)
+    return fragmentos
+
+
+# --- MAP-REDUCE ---
+def contenido_fragmento(req_content, fragmento, numero, total):
+    contenido = [PROMPT_FRAGMENTO, f"=== PERFIL REQUERIDO ===\n{req_content}",
+                 f"=== SOPORTES (PARTE {numero} DE {total}) ==="]
+    for soporte in fragmento:
+        if soporte.get("texto"):
+            contenido.append(f"DOCUMENTO ({soporte['nombre']}):\n{soporte['texto']}")
+        if soporte.get("imagen") is not None:
+            contenido.append(f"IMAGEN ({soporte['nombre']}):")
+            contenido.append(soporte["imagen"])
+    return contenido
+
+
+def _soportes_resumidos(resumenes):
+    """Los resúmenes reemplazan a los soportes originales en la evaluación final."""
+    total = len(resumenes)
+    return [{"nombre": f"RESUMEN DE SOPORTES {i + 1}/{total}", "tipo": "application/pdf",
+             "texto": texto, "imagen": None} for i, texto in enumerate(resumenes)]
+
+
+def resumir_soportes(req_content, soportes, texto_base, consumo=None):
+    """Etapa map: resume los fragmentos en paralelo con el modelo rápido."""
+    fragmentos = fragmentar_soportes(soportes, limite_fragmento(texto_base))
+    model = genai.GenerativeModel(MODELO_RAPIDO)
+    with ThreadPoolExecutor(max_workers=len(fragmentos)) as pool:
+        respuestas = list(pool.map(
+            lambda par: model.generate_content(
+                contenido_fragmento(req_content, par[1], par[0] + 1, len(fragmentos))),
+            enumerate(fragmentos)))
+    for r in respuestas:
+        sumar_consumo(consumo, MODELO_RAPIDO, r)
+    return _soportes_resumidos([r.text for r in respuestas])
+
+
+async def resumir_soportes_async(req_content, soportes, texto_base, consumo=None):
+    """Etapa map asíncrona: los fragmentos se resumen en paralelo."""
+    fragmentos = fragmentar_soportes(soportes, limite_fragmento(texto_base))
+    model = genai.GenerativeModel(MODELO_RAPIDO)
+    respuestas = await asyncio.gather(*[
+        model.generate_content_async(contenido_fragmento(req_content, f, i + 1, len(fragmentos)))
+        for i, f in enumerate(fragmentos)
+    ])
+    for r in respuestas:
+        sumar_consumo(consumo, MODELO_RAPIDO, r)
+    return _soportes_resumidos([r.text for r in respuestas])
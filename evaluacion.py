@@ -0,0 +1,226 @@
+import google.generativeai as genai
+from aislamiento import leer_pdf
+from PIL import Image
+import os
+import json
+import openpyxl
+from openpyxl.styles import Alignment
+import io
+import re
+from enrutamiento import preflight, resumir_soportes, sumar_consumo
+
+# --- LÓGICA DE EVALUACIÓN (variante "idoneidad" de motor.py) ---
+# Concepto JSON multimodal que usan Streamlit y la línea de comandos. Este
+# módulo no depende de Streamlit: puede importarse desde scripts y procesos
+# de trabajo sin levantar la interfaz.
+MODELO = "gemini-2.0-flash"
+
+TIPOS_IMAGEN = ["image/png", "image/jpeg", "image/jpg"]
+
+def extraer_texto_pdf(uploaded_file):
+    """Texto de un PDF, leído en un proceso aislado (ver aislamiento.py)."""
+    try:
+        if hasattr(uploaded_file, "seek"):
+            uploaded_file.seek(0)
+        text, _ = leer_pdf(uploaded_file.read(), con_imagen=False)
+        return text
+    except Exception as e:
+        return f"[Error PDF: {str(e)}]"
+
+def cargar_imagen(uploaded_file):
+    try:
+        return Image.open(uploaded_file)
+    except Exception as e:
+        return None
+
+def optimize_image(image, max_size=(1024, 1024)):
+    """Redimensiona y optimiza la imagen para reducir latencia."""
+    try:
+        # Redimensionar si es muy grande (mantiene relación de aspecto)
+        if image.width > max_size[0] or image.height > max_size[1]:
+            image.thumbnail(max_size, Image.Resampling.LANCZOS)
+        
+        # Convertir a RGB (elimina canal Alpha que pesa más)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+            
+        return image
+    except Exception as e:
+        return None
+
+def fill_excel_template(data_json, template_path="2026_IDONEIDAD_NEW.xlsx"):
+    try:
+        if not os.path.exists(template_path):
+            return None, f"Plantilla '{template_path}' no encontrada."
+
+        wb = openpyxl.load_workbook(template_path)
+        ws = wb.active
+        
+        # 1. Datos Personales (Append to existing text)
+        if 'nombre' in data_json and ws['D6'].value:
+            ws['D6'] = f"{ws['D6'].value} {data_json['nombre']}"
+            
+        if 'cedula' in data_json and ws['D7'].value:
+            ws['D7'] = f"{ws['D7'].value} {data_json['cedula']}"
+            
+        # 2. Idoneidad y Formación
+        if 'idoneidad_texto' in data_json:
+            ws['D10'] = data_json['idoneidad_texto']
+            ws['D10'].alignment = Alignment(wrap_text=True, vertical='top')
+            
+        if 'formacion_texto' in data_json:
+            ws['D13'] = data_json['formacion_texto']
+            ws['D13'].alignment = Alignment(wrap_text=True, vertical='top')
+            
+        # 3. Tabla de Experiencia
+        if 'experiencia_lista' in data_json:
+            start_row = 21 # Nueva fila de inicio
+            for i, exp in enumerate(data_json['experiencia_lista']):
+                if i > 15: break # Limite de filas
+                row = start_row + i
+                
+                # Validar fechas estrictas
+                fecha_inicio = exp.get('fecha_inicio', '')
+                fecha_fin = exp.get('fecha_fin', '')
+                
+                # Si falta alguna fecha completa, no escribir (aunque la IA ya debió filtrar)
+                if len(fecha_inicio) == 10 and len(fecha_fin) == 10:
+                    ws[f'D{row}'] = exp.get('empresa', '')
+                    ws[f'E{row}'] = fecha_inicio
+                    ws[f'F{row}'] = fecha_fin
+                    ws[f'I{row}'] = exp.get('validada', 'NO') # Columna I para Validada
+                
+        output = io.BytesIO()
+        wb.save(output)
+        return output.getvalue(), None
+    except Exception as e:
+        return None, str(e)
+
+def clean_and_parse_json(text):
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        try:
+            text = re.sub(r"```json\s*", "", text)
+            text = re.sub(r"```\s*$", "", text)
+            text = text.strip()
+            text = text.replace('\n', '\\n').replace('\r', '').replace('\t', '\\t')
+            return json.loads(text, strict=False)
+        except:
+            raise
+
+def leer_soporte(tipo, data):
+    """Retorna (texto, imagen_optimizada) de un soporte PDF o imagen."""
+    text, img_opt = None, None
+    if tipo == "application/pdf":
+        # Texto y, si parece escaneado, su primera imagen (proceso aislado)
+        text, img_opt = leer_pdf(data)
+    elif tipo in TIPOS_IMAGEN:
+        img = cargar_imagen(io.BytesIO(data))
+        if img:
+            # Optimizar imagen antes de enviar
+            img_opt = optimize_image(img)
+    return text, img_opt
+
+def formato_requisitos(nombre_pdf, texto_pdf, texto_adicional):
+    """Sección de requisitos del contenido: texto del PDF (si hay) y texto manual."""
+    req_content = ""
+    if texto_pdf is not None:
+        req_content += f"REQUISITOS (PDF): {texto_pdf}\n"
+    if texto_adicional:
+        req_content += f"REQUISITOS (TXT): {texto_adicional}\n"
+    return req_content
+
+def instrucciones_auditor(nombre, identificacion):
+    """Prompt del Sistema (Instrucciones) con el esquema JSON de salida."""
+    system_prompt = f"""
+    Eres el Auditor de Contratación del SENA.
+
+    OBJETIVO:
+    Determinar si el candidato {nombre} (ID: {identificacion}) CUMPLE o NO CUMPLE con el perfil.
+
+    REGLAS ESTRICTAS DE VALIDACIÓN:
+    1. FECHAS EXACTAS: Solo acepta experiencias con fecha de inicio y fin completas (DD/MM/AAAA). 
+       - Si una certificación solo tiene MM/AAAA -> DESCARTARLA (No cuenta).
+       - Si no tiene fecha de fin (y no es actual) -> DESCARTARLA.
+    2. TARJETA PROFESIONAL: Si el perfil exige Tarjeta Profesional, búscala en los soportes.
+       - Si la encuentras, extrae: "COPNIA [Número] [Fecha]".
+    3. INSTRUCTORES: La experiencia como "Instructor SENA" o similar ES VÁLIDA como experiencia técnica.
+    4. SUMATORIA: Suma solo los tiempos de certificaciones VÁLIDAS (con fechas completas).
+
+    SALIDA JSON OBLIGATORIA:
+    {{
+        "nombre": "{nombre}",
+        "cedula": "{identificacion}",
+        "concepto_final": "CUMPLE (Solo si cumple 100% formación Y tiempo total experiencia) o NO CUMPLE",
+        "idoneidad_texto": "CONCLUSIÓN: [CUMPLE/NO CUMPLE]. Justificación detallada. Si falta Tarjeta Profesional y se requiere, indicarlo.",
+        "formacion_texto": "Título Profesional + Fecha Grado. (Y Tarjeta Profesional si aplica).",
+        "experiencia_lista": [
+            {{
+                "empresa": "Nombre Empresa",
+                "fecha_inicio": "DD/MM/AAAA",
+                "fecha_fin": "DD/MM/AAAA",
+                "meses": 12,
+                "dias": 0,
+                "validada": "SI"
+            }}
+        ],
+        "analisis_detallado_markdown": "Tabla resumen en Markdown."
+    }}
+    """
+    return system_prompt
+
+def armar_contenido(nombre, identificacion, req_content, soportes_unicos):
+    """Contenido multimodal para Gemini: instrucciones, perfil y evidencias."""
+    gemini_content = [
+        instrucciones_auditor(nombre, identificacion),
+        f"=== PERFIL REQUERIDO ===\n{req_content}",
+        "=== EVIDENCIAS DEL CANDIDATO ===",
+    ]
+    for soporte in soportes_unicos:
+        if soporte["tipo"] == "application/pdf":
+            gemini_content.append(f"DOCUMENTO PDF ({soporte['nombre']}):\n{soporte['texto']}")
+        elif soporte["imagen"] is not None:
+            gemini_content.append(f"IMAGEN ({soporte['nombre']}):")
+            gemini_content.append(soporte["imagen"])
+    return gemini_content
+
+def _como_se_envian(soportes):
+    # armar_contenido manda los PDF solo como texto: la imagen de un PDF
+    # escaneado (usada para deduplicar) no debe contar en el preflight ni
+    # viajar en los fragmentos del resumen.
+    return [{**s, "imagen": None} if s["tipo"] == "application/pdf" else s for s in soportes]
+
+def planificar_evaluacion(nombre, identificacion, req_content, soportes_unicos, consumo=None):
+    """Preflight local y, si hace falta, resumen por partes (map-reduce).
+
+    Retorna (ruta, gemini_content); gemini_content es None si la ruta es
+    "rechazado". ruta["modelo"] indica el modelo a usar en la evaluación.
+    consumo: dict donde se acumulan los tokens de los resúmenes (ver enrutamiento.sumar_consumo).
+    """
+    soportes_unicos = _como_se_envian(soportes_unicos)
+    texto_base = instrucciones_auditor(nombre, identificacion) + req_content
+    ruta = preflight(texto_base, soportes_unicos)
+    if ruta["modo"] == "rechazado":
+        return ruta, None
+    if ruta["modo"] == "fragmentado":
+        soportes_unicos = resumir_soportes(req_content, soportes_unicos, texto_base, consumo)
+    return ruta, armar_contenido(nombre, identificacion, req_content, soportes_unicos)
+
+def _modelo_json(modelo):
+    return genai.GenerativeModel(modelo, generation_config={"response_mime_type": "application/json"})
+
+def generar_respuesta(gemini_content, modelo=MODELO, consumo=None):
+    """Texto (JSON) de la respuesta del modelo."""
+    response = _modelo_json(modelo).generate_content(gemini_content)
+    sumar_consumo(consumo, modelo, response)
+    return response.text
+
+async def generar_respuesta_async(gemini_content, modelo=MODELO, consumo=None):
+    response = await _modelo_json(modelo).generate_content_async(gemini_content)
+    sumar_consumo(consumo, modelo, response)
+    return response.text
+
+def evaluar_contenido(gemini_content, modelo=MODELO, consumo=None):
+    """Llama al modelo y retorna el JSON parseado de la respuesta."""
+    return clean_and_parse_json(generar_respuesta(gemini_content, modelo, consumo))
@@ -1,15 +1,13 @@
 
 import streamlit as st
 import google.generativeai as genai
-from pypdf import PdfReader
-from PIL import Image
 import os
 import json
-import openpyxl
-from openpyxl.styles import Alignment
-import io
-import re
 import pandas as pd
+from almacen import buscar_por_cedula
+from prefiltro import MODOS, PREFILTRO_MODO
+from motor import Motor, Solicitud
+import perfilado
 
 # --- CONFIGURACIÓN DE LA PÁGINA ---
 st.set_page_config(
@@ -18,6 +16,21 @@ st.set_page_config(
     layout="wide"
 )
 
+# --- FRAGMENTOS ---
+# Las interacciones dentro de un fragmento solo re-ejecutan el fragmento,
+# no todo el script.
+@st.fragment
+def compartir_app():
+    import pyshorteners
+    
+    app_url = st.text_input("URL de la App:", placeholder="https://...")
+    if app_url and st.button("Generar Link Corto"):
+        try:
+            s = pyshorteners.Shortener()
+            st.code(s.tinyurl.short(app_url), language="text")
+        except:
+            st.error("Error al generar link.")
+
 # --- SIDEBAR / CONFIGURACIÓN ---
 with st.sidebar:
     # Logo Oficial SENA
@@ -37,18 +50,21 @@ with st.sidebar:
     else:
         st.warning("⚠️ API Key requerida.")
 
+    # Prefiltro local: descarta sin llamar al modelo lo que claramente NO CUMPLE
+    modo_prefiltro = st.selectbox("🧹 Prefiltro local", MODOS, index=MODOS.index(PREFILTRO_MODO),
+                                  help="flexible: solo casos inequívocos · estricto: aplica todas las reglas · apagado: siempre usa el modelo")
+
+    # Depuración: perfil de CPU y memoria de la próxima evaluación (ver perfilado.py)
+    with st.expander("🛠️ Depuración"):
+        perfilar_evaluacion = st.toggle("🔬 Perfilar evaluación", value=False,
+                                        help="Muestrea la CPU durante la evaluación y permite descargar el perfil")
+        perfilar_memoria = st.checkbox("Incluir memoria (tracemalloc, más lento)", value=False,
+                                       disabled=not perfilar_evaluacion)
+
     # --- SECCIÓN COMPARTIR ---
     st.markdown("---")
     st.markdown("### 🔗 Compartir")
-    import pyshorteners
-    
-    app_url = st.text_input("URL de la App:", placeholder="https://...")
-    if app_url and st.button("Generar Link Corto"):
-        try:
-            s = pyshorteners.Shortener()
-            st.code(s.tinyurl.short(app_url), language="text")
-        except:
-            st.error("Error al generar link.")
+    compartir_app()
 
 # --- ESTILOS CSS DINÁMICOS (MODERNO & INSTITUCIONAL) ---
 if dark_mode:
@@ -209,98 +225,98 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
-# --- LÓGICA DE NEGOCIO ---
-def extraer_texto_pdf(uploaded_file):
-    try:
-        reader = PdfReader(uploaded_file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
-    except Exception as e:
-        return f"[Error PDF: {str(e)}]"
-
-def cargar_imagen(uploaded_file):
-    try:
-        return Image.open(uploaded_file)
-    except Exception as e:
-        return None
-
-def optimize_image(image, max_size=(1024, 1024)):
-    """Redimensiona y optimiza la imagen para reducir latencia."""
-    try:
-        # Redimensionar si es muy grande (mantiene relación de aspecto)
-        if image.width > max_size[0] or image.height > max_size[1]:
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        # Convertir a RGB (elimina canal Alpha que pesa más)
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-            
-        return image
-    except Exception as e:
-        return None
-
-def fill_excel_template(data_json, template_path="2026_IDONEIDAD_NEW.xlsx"):
-    try:
-        if not os.path.exists(template_path):
-            return None, f"Plantilla '{template_path}' no encontrada."
+# --- MOTOR DE EVALUACIÓN ---
+# Extracción, prefiltro, modelo, historial y Excel (ver motor.py). Su caché
+# de extracción vive en el proceso: evaluar de nuevo los mismos archivos no
+# los vuelve a leer.
+motor = Motor("idoneidad")
+
+# --- VISUALIZACIÓN ---
+@st.fragment
+def mostrar_resultado(evaluacion):
+    data_json = evaluacion["data_json"]
+    st.markdown("<div class='result-container'>", unsafe_allow_html=True)
+    
+    concepto = data_json.get('concepto_final', 'NO CUMPLE').upper()
+    color_banner = "#39A900" if "CUMPLE" in concepto and "NO" not in concepto else "#FC7323"
+    icon_banner = "✅" if "CUMPLE" in concepto and "NO" not in concepto else "⚠️"
+    
+    st.markdown(f"""
+        <div style='background-color: {color_banner}; color: white; padding: 20px; border-radius: 12px; text-align: center; font-size: 24px; font-weight: 700; margin-bottom: 25px; box-shadow: 0 4px 12px rgba(0,0,0,0.15);'>
+            {icon_banner} {concepto}
+        </div>
+    """, unsafe_allow_html=True)
+
+    if evaluacion["omitidos"]:
+        st.info("📎 Soportes duplicados omitidos del análisis:\n\n" + "\n".join(
+            f"- {o['nombre']} ({o['motivo']} a {o['duplicado_de']})" for o in evaluacion["omitidos"]))
+
+    ruta = evaluacion["preflight"]
+    if ruta is None:
+        st.caption(f"🧹 Resuelto por el prefiltro local ({data_json['prefiltro']['modo']}), sin llamar al modelo")
+    else:
+        st.caption(f"⚙️ ~{ruta['tokens']:,} tokens · {ruta['imagenes']} imágenes · "
+                   f"{ruta['modelo']} ({ruta['motivo']})")
 
-        wb = openpyxl.load_workbook(template_path)
-        ws = wb.active
-        
-        # 1. Datos Personales (Append to existing text)
-        if 'nombre' in data_json and ws['D6'].value:
-            ws['D6'] = f"{ws['D6'].value} {data_json['nombre']}"
-            
-        if 'cedula' in data_json and ws['D7'].value:
-            ws['D7'] = f"{ws['D7'].value} {data_json['cedula']}"
-            
-        # 2. Idoneidad y Formación
-        if 'idoneidad_texto' in data_json:
-            ws['D10'] = data_json['idoneidad_texto']
-            ws['D10'].alignment = Alignment(wrap_text=True, vertical='top')
-            
-        if 'formacion_texto' in data_json:
-            ws['D13'] = data_json['formacion_texto']
-            ws['D13'].alignment = Alignment(wrap_text=True, vertical='top')
-            
-        # 3. Tabla de Experiencia
-        if 'experiencia_lista' in data_json:
-            start_row = 21 # Nueva fila de inicio
-            for i, exp in enumerate(data_json['experiencia_lista']):
-                if i > 15: break # Limite de filas
-                row = start_row + i
-                
-                # Validar fechas estrictas
-                fecha_inicio = exp.get('fecha_inicio', '')
-                fecha_fin = exp.get('fecha_fin', '')
-                
-                # Si falta alguna fecha completa, no escribir (aunque la IA ya debió filtrar)
-                if len(fecha_inicio) == 10 and len(fecha_fin) == 10:
-                    ws[f'D{row}'] = exp.get('empresa', '')
-                    ws[f'E{row}'] = fecha_inicio
-                    ws[f'F{row}'] = fecha_fin
-                    ws[f'I{row}'] = exp.get('validada', 'NO') # Columna I para Validada
-                
-        output = io.BytesIO()
-        wb.save(output)
-        return output.getvalue(), None
-    except Exception as e:
-        return None, str(e)
-
-def clean_and_parse_json(text):
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        try:
-            text = re.sub(r"```json\s*", "", text)
-            text = re.sub(r"```\s*$", "", text)
-            text = text.strip()
-            text = text.replace('\n', '\\n').replace('\r', '').replace('\t', '\\t')
-            return json.loads(text, strict=False)
-        except:
-            raise
+    st.markdown("### 📊 Análisis de Idoneidad")
+    if 'analisis_detallado_markdown' in data_json:
+        st.markdown(data_json['analisis_detallado_markdown'])
+    else:
+        st.markdown(data_json.get('idoneidad_texto', ''))
+    
+    st.markdown("### 🗓️ Detalle de Experiencia (Sumatoria)")
+    if evaluacion["df_exp"] is not None:
+        st.table(evaluacion["df_exp"])
+    else:
+        st.info("No se extrajo experiencia estructurada.")
+
+    # Exportar
+    if evaluacion["excel_data"]:
+        st.download_button(
+            label="📥 Descargar Concepto (Excel)",
+            data=evaluacion["excel_data"],
+            file_name=f"IDONEIDAD_{evaluacion['nombre'].replace(' ', '_')}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+    else:
+        st.error(f"Error generando Excel: {evaluacion['error_excel']}")
+
+    resultado_perfil = perfilado.cargar(evaluacion.get("perfilado"))
+    if resultado_perfil:
+        resumen = f"🔬 Perfilado: {resultado_perfil['duracion_s']} s · {resultado_perfil['muestras']} muestras"
+        if resultado_perfil["memoria"]:
+            resumen += f" · pico {resultado_perfil['memoria']['pico_bytes'] / 2**20:.1f} MB"
+        st.caption(resumen)
+        p1, p2 = st.columns(2)
+        with p1:
+            st.download_button("📥 Perfil (JSON)", data=json.dumps(resultado_perfil, ensure_ascii=False),
+                               file_name=f"perfilado_{resultado_perfil['id']}.json", mime="application/json")
+        with p2:
+            st.download_button("📥 Pilas plegadas (flamegraph)", data=perfilado.pilas_plegadas(resultado_perfil),
+                               file_name=f"perfilado_{resultado_perfil['id']}.txt", mime="text/plain")
+    
+    st.markdown("</div>", unsafe_allow_html=True)
+
+@st.fragment
+def historial_evaluaciones():
+    with st.expander("🗂️ Historial de Evaluaciones"):
+        cedula_consulta = st.text_input("Consultar por cédula", placeholder="Ej: 123456789", key="cedula_consulta")
+        if cedula_consulta:
+            historial = buscar_por_cedula(cedula_consulta)
+            if historial:
+                st.dataframe(pd.DataFrame([{
+                    "Fecha": ev["creado_en"],
+                    "Nombre": ev["nombre"],
+                    "Concepto": ev["concepto"],
+                    "Modelo": ev["modelo"],
+                    "Origen": ev["origen"],
+                } for ev in historial]), use_container_width=True, hide_index=True)
+
+                opciones = {f"{ev['creado_en']} · {ev['concepto'] or 'Sin concepto'}": ev for ev in historial}
+                seleccion = st.selectbox("Ver detalle", list(opciones.keys()))
+                st.json(opciones[seleccion]["resultado"])
+            else:
+                st.info("No hay evaluaciones registradas para esta cédula.")
 
 # --- INTERFAZ PRINCIPAL ---
 col1, col2 = st.columns([1, 1.2], gap="large")
@@ -335,122 +351,45 @@ if st.button("🚀 EVALUAR CANDIDATO", type="primary"):
     elif not soportes:
         st.error("❌ Faltan los Soportes.")
     else:
-        with st.spinner("🧠 Analizando documentos e imágenes... Calculando tiempos..."):
+        with st.spinner("🧠 Analizando documentos e imágenes... Calculando tiempos..."), \
+                perfilado.perfilar(f"streamlit {identificacion}",
+                                   ("completo" if perfilar_memoria else "cpu") if perfilar_evaluacion else None) as perfil:
             try:
-                # 1. Preparar Contexto de Requisitos
-                req_content = ""
-                if requisitos_pdf:
-                    req_content += f"REQUISITOS (PDF): {extraer_texto_pdf(requisitos_pdf)}\n"
-                if requisitos_text:
-                    req_content += f"REQUISITOS (TXT): {requisitos_text}\n"
-
-                # 2. Preparar Contenido Multimodal para Gemini
-                gemini_content = []
-                
-                # Prompt del Sistema (Instrucciones)
-                system_prompt = f"""
-                Eres el Auditor de Contratación del SENA.
-                
-                OBJETIVO:
-                Determinar si el candidato {nombre} (ID: {identificacion}) CUMPLE o NO CUMPLE con el perfil.
-                
-                REGLAS ESTRICTAS DE VALIDACIÓN:
-                1. FECHAS EXACTAS: Solo acepta experiencias con fecha de inicio y fin completas (DD/MM/AAAA). 
-                   - Si una certificación solo tiene MM/AAAA -> DESCARTARLA (No cuenta).
-                   - Si no tiene fecha de fin (y no es actual) -> DESCARTARLA.
-                2. TARJETA PROFESIONAL: Si el perfil exige Tarjeta Profesional, búscala en los soportes.
-                   - Si la encuentras, extrae: "COPNIA [Número] [Fecha]".
-                3. INSTRUCTORES: La experiencia como "Instructor SENA" o similar ES VÁLIDA como experiencia técnica.
-                4. SUMATORIA: Suma solo los tiempos de certificaciones VÁLIDAS (con fechas completas).
-
-                SALIDA JSON OBLIGATORIA:
-                {{
-                    "nombre": "{nombre}",
-                    "cedula": "{identificacion}",
-                    "concepto_final": "CUMPLE (Solo si cumple 100% formación Y tiempo total experiencia) o NO CUMPLE",
-                    "idoneidad_texto": "CONCLUSIÓN: [CUMPLE/NO CUMPLE]. Justificación detallada. Si falta Tarjeta Profesional y se requiere, indicarlo.",
-                    "formacion_texto": "Título Profesional + Fecha Grado. (Y Tarjeta Profesional si aplica).",
-                    "experiencia_lista": [
-                        {{
-                            "empresa": "Nombre Empresa",
-                            "fecha_inicio": "DD/MM/AAAA",
-                            "fecha_fin": "DD/MM/AAAA",
-                            "meses": 12,
-                            "dias": 0,
-                            "validada": "SI"
-                        }}
-                    ],
-                    "analisis_detallado_markdown": "Tabla resumen en Markdown."
-                }}
-                """
-                
-                gemini_content.append(system_prompt)
-                gemini_content.append(f"=== PERFIL REQUERIDO ===\n{req_content}")
-                gemini_content.append("=== EVIDENCIAS DEL CANDIDATO ===")
-
-                # Procesar Soportes (PDF Texto + Imágenes)
-                for archivo in soportes:
-                    if archivo.type == "application/pdf":
-                        text = extraer_texto_pdf(archivo)
-                        gemini_content.append(f"DOCUMENTO PDF ({archivo.name}):\n{text}")
-                    elif archivo.type in ["image/png", "image/jpeg", "image/jpg"]:
-                        img = cargar_imagen(archivo)
-                        if img:
-                            # Optimizar imagen antes de enviar
-                            img_opt = optimize_image(img)
-                            if img_opt:
-                                gemini_content.append(f"IMAGEN ({archivo.name}):")
-                                gemini_content.append(img_opt)
-
-                # 3. Llamada al Modelo
-                model = genai.GenerativeModel("gemini-2.0-flash", generation_config={"response_mime_type": "application/json"})
-                response = model.generate_content(gemini_content)
-                
-                # 4. Procesar Respuesta
-                data_json = clean_and_parse_json(response.text)
-                
-                # 5. Visualización
-                st.markdown("<div class='result-container'>", unsafe_allow_html=True)
-                
-                concepto = data_json.get('concepto_final', 'NO CUMPLE').upper()
-                color_banner = "#39A900" if "CUMPLE" in concepto and "NO" not in concepto else "#FC7323"
-                icon_banner = "✅" if "CUMPLE" in concepto and "NO" not in concepto else "⚠️"
-                
-                st.markdown(f"""
-                    <div style='background-color: {color_banner}; color: white; padding: 20px; border-radius: 12px; text-align: center; font-size: 24px; font-weight: 700; margin-bottom: 25px; box-shadow: 0 4px 12px rgba(0,0,0,0.15);'>
-                        {icon_banner} {concepto}
-                    </div>
-                """, unsafe_allow_html=True)
-
-                st.markdown("### 📊 Análisis de Idoneidad")
-                if 'analisis_detallado_markdown' in data_json:
-                    st.markdown(data_json['analisis_detallado_markdown'])
-                else:
-                    st.markdown(data_json.get('idoneidad_texto', ''))
-                
-                st.markdown("### 🗓️ Detalle de Experiencia (Sumatoria)")
-                if 'experiencia_lista' in data_json and data_json['experiencia_lista']:
-                    df_exp = pd.DataFrame(data_json['experiencia_lista'])
-                    st.table(df_exp)
-                else:
-                    st.info("No se extrajo experiencia estructurada.")
-
-                # Exportar
-                excel_data, error_msg = fill_excel_template(data_json)
-                if excel_data:
-                    st.download_button(
-                        label="📥 Descargar Concepto (Excel)",
-                        data=excel_data,
-                        file_name=f"IDONEIDAD_{nombre.replace(' ', '_')}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
-                else:
-                    st.error(f"Error generando Excel: {error_msg}")
-                
-                st.markdown("</div>", unsafe_allow_html=True)
+                ev = motor.ejecutar(Solicitud(
+                    nombre, identificacion,
+                    documentos=[(archivo.name, archivo.type, archivo.getvalue()) for archivo in soportes],
+                    requisitos_pdf=(requisitos_pdf.name, requisitos_pdf.getvalue()) if requisitos_pdf else None,
+                    requisitos_texto=requisitos_text,
+                    origen="streamlit",
+                    prefiltro=modo_prefiltro,
+                    plantilla="2026_IDONEIDAD_NEW.xlsx",
+                ))
+                for aviso in ev.avisos:
+                    st.warning(aviso)
+
+                # Se guarda en la sesión para sobrevivir a los reruns
+                data_json = ev.resultado
+                df_exp = pd.DataFrame(data_json['experiencia_lista']) if data_json.get('experiencia_lista') else None
+                st.session_state["evaluacion"] = {
+                    "data_json": data_json,
+                    "df_exp": df_exp,
+                    "excel_data": ev.excel,
+                    "error_excel": ev.error_excel,
+                    "omitidos": ev.omitidos,
+                    "nombre": nombre,
+                    "preflight": ev.ruta,
+                    "perfilado": perfil.id if perfil else None,
+                }
 
             except Exception as e:
                 st.error(f"Ocurrió un error: {str(e)}")
                 with st.expander("Ver detalle técnico"):
                     st.code(str(e))
 
+# --- RESULTADO (desde session_state) ---
+if "evaluacion" in st.session_state:
+    mostrar_resultado(st.session_state["evaluacion"])
+
+# --- HISTORIAL DE EVALUACIONES ---
+st.markdown("<br>", unsafe_allow_html=True)
+historial_evaluaciones()
@@ -0,0 +1,261 @@
+"""Evaluación masiva de carpetas de candidatos, sin Streamlit.
+
+Uso:
+    python evaluar_lote.py CARPETA_RAIZ --perfil perfil.pdf --salida resultados/
+
+Cada candidato es una carpeta con sus soportes (PDF, JPG, PNG). La cédula y el
+nombre se toman de un archivo `candidato.json` ({"nombre": ..., "cedula": ...})
+o, si no existe, del nombre de la carpeta ("1075234567 - Ana Pérez"). Una
+carpeta de candidato puede tener subcarpetas; todos sus archivos son soportes.
+Si la carpeta trae su propio `requisitos.pdf` o `requisitos.txt`, reemplaza al
+perfil general.
+
+Cada candidato pasa por el motor de evaluación (motor.py, variante
+"idoneidad"): la lectura de los PDF corre en procesos aislados (un documento
+que se cuelga o agota la memoria se reporta como ilegible, ver
+aislamiento.py) repartida en el ejecutor del motor (--ejecutor), y las
+llamadas al modelo en un pool de hilos con tope de concurrencia. Por cada candidato se escribe el Excel de
+IDONEIDAD y una línea en `resumen.jsonl`; ese archivo es también el punto de
+control: al relanzar el comando se omiten los candidatos ya evaluados con
+éxito.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+
+import google.generativeai as genai
+
+import aislamiento
+import motor
+from evaluacion import extraer_texto_pdf
+from prefiltro import MODOS, PREFILTRO_MODO, MODELO_PREFILTRO
+
+TIPOS_POR_EXTENSION = {
+    ".pdf": "application/pdf",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+}
+ARCHIVOS_ESPECIALES = {"candidato.json", "requisitos.pdf", "requisitos.txt"}
+RESUMEN = "resumen.jsonl"
+PLANTILLA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "2026_IDONEIDAD_NEW.xlsx")
+
+
+# --- DESCUBRIMIENTO DE CANDIDATOS ---
+def datos_candidato(carpeta):
+    """(nombre, cedula) desde candidato.json o desde el nombre de la carpeta."""
+    ruta_json = os.path.join(carpeta, "candidato.json")
+    if os.path.exists(ruta_json):
+        with open(ruta_json, encoding="utf-8") as f:
+            datos = json.load(f)
+        return datos.get("nombre", ""), str(datos.get("cedula", ""))
+
+    base = os.path.basename(os.path.normpath(carpeta))
+    m = re.search(r"\d[\d.]{4,}\d", base)
+    if not m:
+        return None, None
+    nombre = (base[:m.start()] + base[m.end():]).replace("_", " ")
+    nombre = re.sub(r"\s+", " ", nombre).strip(" -")
+    return nombre, m.group(0).replace(".", "")
+
+
+def buscar_candidatos(raiz):
+    """Carpetas de candidato bajo `raiz` (no se desciende dentro de una)."""
+    candidatos = []
+    for carpeta, subcarpetas, _ in os.walk(raiz):
+        subcarpetas.sort()
+        if carpeta != raiz and datos_candidato(carpeta)[1]:
+            candidatos.append(carpeta)
+            subcarpetas[:] = []
+    return candidatos
+
+
+def leer_perfil(ruta):
+    """Requisitos de un PDF o TXT, como argumentos de motor.Solicitud (el PDF se extrae una vez)."""
+    if ruta.lower().endswith(".pdf"):
+        with open(ruta, "rb") as f:
+            return {"requisitos_precargado": {"nombre": os.path.basename(ruta), "texto": extraer_texto_pdf(f)}}
+    with open(ruta, encoding="utf-8") as f:
+        return {"requisitos_texto": f.read()}
+
+
+# --- ETAPAS ---
+def preparar_candidato(carpeta, perfil, lote):
+    """Ingesta, extracción y optimización de un candidato (ver motor.py)."""
+    nombre, cedula = datos_candidato(carpeta)
+    for especial in ("requisitos.pdf", "requisitos.txt"):
+        if os.path.exists(os.path.join(carpeta, especial)):
+            perfil = leer_perfil(os.path.join(carpeta, especial))
+
+    documentos = []
+    for actual, subcarpetas, archivos in os.walk(carpeta):
+        subcarpetas.sort()
+        for archivo in sorted(archivos):
+            tipo = TIPOS_POR_EXTENSION.get(os.path.splitext(archivo)[1].lower())
+            if not tipo or (actual == carpeta and archivo in ARCHIVOS_ESPECIALES):
+                continue
+            with open(os.path.join(actual, archivo), "rb") as f:
+                documentos.append((os.path.relpath(os.path.join(actual, archivo), carpeta), tipo, f.read()))
+
+    if not perfil:
+        raise ValueError("Sin requisitos: use --perfil o requisitos.pdf/txt en la carpeta.")
+    ev = lote.motor.preparar(motor.Solicitud(
+        nombre, cedula, documentos=documentos, **perfil, origen="cli",
+        prefiltro=lote.prefiltro, modelo=lote.modelo, plantilla=lote.plantilla))
+    ev.carpeta = carpeta
+    return ev
+
+
+class Lote:
+    """Estado compartido de una corrida: punto de control y resumen JSONL."""
+
+    def __init__(self, raiz, salida, modelo, reintentos, plantilla, prefiltro=PREFILTRO_MODO):
+        self.raiz = raiz
+        self.salida = salida
+        self.modelo = modelo
+        self.reintentos = reintentos
+        self.plantilla = plantilla
+        self.prefiltro = prefiltro
+        self.motor = motor.Motor("idoneidad", reintentos=reintentos)
+        self.ruta_resumen = os.path.join(salida, RESUMEN)
+        self._lock = threading.Lock()
+        self.completados = self._leer_completados()
+        self.ok = 0
+        self.errores = 0
+        self.prefiltrados = 0
+
+    def _leer_completados(self):
+        completados = set()
+        if os.path.exists(self.ruta_resumen):
+            with open(self.ruta_resumen, encoding="utf-8") as f:
+                for linea in f:
+                    try:
+                        registro = json.loads(linea)
+                    except json.JSONDecodeError:
+                        continue  # Línea incompleta de una corrida interrumpida
+                    if registro.get("estado") == "ok":
+                        completados.add(registro["carpeta"])
+        return completados
+
+    def clave(self, carpeta):
+        return os.path.relpath(carpeta, self.raiz)
+
+    def registrar(self, carpeta, estado, **campos):
+        registro = {
+            "carpeta": self.clave(carpeta),
+            "estado": estado,
+            "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            **campos,
+        }
+        with self._lock:
+            with open(self.ruta_resumen, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if estado == "ok":
+                self.ok += 1
+                if campos.get("modelo") == MODELO_PREFILTRO:
+                    self.prefiltrados += 1
+            else:
+                self.errores += 1
+            print(f"[{estado.upper()}] {registro['carpeta']}", file=sys.stderr)
+
+    def evaluar(self, ev):
+        """Prompt, modelo (con reintentos), historial y Excel de un candidato ya preparado."""
+        carpeta, nombre, cedula = ev.carpeta, ev.nombre, ev.identificacion
+        try:
+            self.motor.completar(ev)
+            for aviso in ev.avisos:
+                print(f"{aviso} ({cedula})", file=sys.stderr)
+
+            archivo_excel = None
+            if ev.excel:
+                archivo_excel = f"IDONEIDAD_{cedula}_{nombre.replace(' ', '_')}.xlsx"
+                with open(os.path.join(self.salida, archivo_excel), "wb") as f:
+                    f.write(ev.excel)
+
+            self.registrar(carpeta, "ok", nombre=nombre, cedula=cedula,
+                           concepto_final=ev.concepto,
+                           excel=archivo_excel, error_excel=ev.error_excel,
+                           omitidos=ev.omitidos, tiempos=ev.tiempos, modelo=ev.modelo,
+                           preflight=ev.ruta, prefiltro=ev.fallos, consumo=ev.consumo)
+        except Exception as e:
+            self.registrar(carpeta, "error", nombre=nombre, cedula=cedula, error=str(e))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluación masiva de candidatos SENA.")
+    parser.add_argument("raiz", help="Carpeta con las carpetas de candidatos")
+    parser.add_argument("--perfil", help="PDF o TXT con los requisitos del perfil")
+    parser.add_argument("--salida", default="resultados", help="Carpeta de salida (Excel + resumen.jsonl)")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 2,
+                        help="Procesos aislados para la lectura de PDF (y trabajadores del ejecutor)")
+    parser.add_argument("--ejecutor", choices=list(motor.EJECUTORES), default=motor.MOTOR_EJECUTOR,
+                        help="Cómo reparte el motor la extracción de cada candidato (ver motor.py)")
+    parser.add_argument("--concurrencia", type=int, default=4,
+                        help="Máximo de llamadas simultáneas al modelo")
+    parser.add_argument("--modelo", help="Forzar un modelo (por defecto lo elige el preflight)")
+    parser.add_argument("--reintentos", type=int, default=2)
+    parser.add_argument("--plantilla", default=PLANTILLA, help="Plantilla Excel de IDONEIDAD")
+    parser.add_argument("--prefiltro", choices=MODOS, default=PREFILTRO_MODO,
+                        help="Prefiltro local que descarta sin llamar al modelo (ver prefiltro.py)")
+    args = parser.parse_args(argv)
+
+    api_key = os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        parser.error("Falta la variable de entorno GOOGLE_API_KEY.")
+    genai.configure(api_key=api_key)
+
+    aislamiento.configurar(procesos=args.procesos)
+    motor.configurar(ejecutor=args.ejecutor, trabajadores=args.procesos)
+    perfil = leer_perfil(args.perfil) if args.perfil else {}
+    os.makedirs(args.salida, exist_ok=True)
+    lote = Lote(args.raiz, args.salida, args.modelo, args.reintentos, args.plantilla, args.prefiltro)
+
+    candidatos = buscar_candidatos(args.raiz)
+    pendientes = [c for c in candidatos if lote.clave(c) not in lote.completados]
+    print(f"{len(candidatos)} candidatos, {len(candidatos) - len(pendientes)} ya evaluados, "
+          f"{len(pendientes)} pendientes.", file=sys.stderr)
+
+    # Tope de candidatos en vuelo (extraídos esperando al modelo incluidos),
+    # para no acumular en memoria las imágenes de todo el lote.
+    cupos = threading.BoundedSemaphore(args.procesos + 2 * args.concurrencia)
+
+    with ThreadPoolExecutor(max_workers=args.concurrencia) as hilos, \
+            ThreadPoolExecutor(max_workers=args.procesos) as extraccion:
+
+        def al_extraer(carpeta, futuro):
+            try:
+                candidato = futuro.result()
+            except Exception as e:
+                lote.registrar(carpeta, "error", error=str(e))
+                cupos.release()
+                return
+            evaluacion = hilos.submit(lote.evaluar, candidato)
+            evaluacion.add_done_callback(lambda _: cupos.release())
+
+        for carpeta in pendientes:
+            cupos.acquire()
+            futuro = extraccion.submit(preparar_candidato, carpeta, perfil, lote)
+            futuro.add_done_callback(partial(al_extraer, carpeta))
+
+    # El proceso termina antes de la exportación programada: se exporta ya
+    try:
+        import analitica
+        analitica.exportar()
+    except Exception as e:
+        print(f"No se pudo exportar la analítica: {e}", file=sys.stderr)
+
+    print(f"Listo: {lote.ok} evaluados ({lote.prefiltrados} por el prefiltro), {lote.errores} con error. "
+          f"Resumen en {lote.ruta_resumen}", file=sys.stderr)
+    return 1 if lote.errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import os
+import threading
+
+# --- EXTRACCIÓN DE TEXTO DE PDF (BACKENDS INTERCAMBIABLES) ---
+# Cada backend recibe los bytes del PDF y el tope de páginas, y retorna
+# (textos por página, total de páginas del documento).
+# PDF_BACKEND elige el preferido; si no está instalado o falla al leer un
+# documento (PDF dañado, cifrado, mal formado), se prueba el siguiente de
+# ORDEN_RESPALDO. Ver bench_extractores.py para comparar velocidades.
+#
+#   pdfium  -> pypdfium2 (PDFium de Chrome, en C++; la rueda ya trae la librería)
+#   pypdf   -> pypdf, Python puro (el extractor original)
+#   poppler -> python-poppler (opcional; requiere libpoppler-cpp-dev)
+
+PDF_BACKEND = os.environ.get("PDF_BACKEND", "pdfium")
+ORDEN_RESPALDO = ("pdfium", "pypdf", "poppler")
+# Tope de páginas leídas por documento; un soporte real rara vez lo alcanza
+MAX_PAGINAS_PDF = int(os.environ.get("MAX_PAGINAS_PDF", 200))
+
+# PDFium no es seguro entre hilos: gunicorn atiende con varios hilos por proceso
+_lock_pdfium = threading.Lock()
+
+
+class ErrorExtraccion(Exception):
+    """Ningún backend pudo leer el PDF."""
+
+
+def _texto_pdfium(data, max_paginas):
+    import pypdfium2 as pdfium
+
+    with _lock_pdfium:
+        pdf = pdfium.PdfDocument(data)
+        try:
+            paginas = []
+            for i in range(min(len(pdf), max_paginas)):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                paginas.append(textpage.get_text_range())
+                textpage.close()
+                page.close()
+            return paginas, len(pdf)
+        finally:
+            pdf.close()
+
+
+def _texto_pypdf(data, max_paginas):
+    import io
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    return [page.extract_text() or "" for page in reader.pages[:max_paginas]], len(reader.pages)
+
+
+def _texto_poppler(data, max_paginas):
+    import poppler
+
+    doc = poppler.load_from_data(data)
+    return [doc.create_page(i).text() for i in range(min(doc.pages, max_paginas))], doc.pages
+
+
+BACKENDS = {
+    "pdfium": _texto_pdfium,
+    "pypdf": _texto_pypdf,
+    "poppler": _texto_poppler,
+}
+
+
+def _normalizar(texto):
+    # PDFium separa líneas con \r\n; el resto del código (simhash, FTS) espera \n
+    return texto.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def extraer_texto(data, backend=None, max_paginas=None):
+    """Texto de un PDF (bytes), páginas separadas por salto de línea.
+
+    Solo se leen las primeras `max_paginas` (MAX_PAGINAS_PDF por defecto); si
+    el documento tiene más, el texto termina con una nota de truncado.
+    Retorna (texto, backend_usado). Lanza ErrorExtraccion si ningún backend
+    pudo leer el documento.
+    """
+    max_paginas = max_paginas or MAX_PAGINAS_PDF
+    preferido = backend or PDF_BACKEND
+    if preferido not in BACKENDS:
+        raise ValueError(f"Backend de PDF desconocido: {preferido}. Opciones: {', '.join(BACKENDS)}")
+
+    errores = []
+    for nombre in (preferido, *[b for b in ORDEN_RESPALDO if b != preferido]):
+        try:
+            paginas, total = BACKENDS[nombre](data, max_paginas)
+        except ImportError:
+            continue  # Backend no instalado
+        except Exception as e:
+            errores.append(f"{nombre}: {e}")
+            continue
+        texto = "".join(_normalizar(p) + "\n" for p in paginas)
+        if total > len(paginas):
+            texto += f"[... documento truncado: se leyeron {len(paginas)} de {total} páginas]\n"
+        return texto, nombre
+
+    raise ErrorExtraccion("; ".join(errores) or "No hay backends de PDF instalados")
+
+
+def backends_disponibles():
+    """Backends cuya librería está instalada."""
+    disponibles = []
+    for nombre, modulo in (("pdfium", "pypdfium2"), ("pypdf", "pypdf"), ("poppler", "poppler")):
+        try:
+            __import__(modulo)
+            disponibles.append(nombre)
+        except ImportError:
+            pass
+    return disponibles
@@ -0,0 +1,620 @@
+import asyncio
+import contextvars
+import io
+import multiprocessing
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+
+import auditoria
+import evaluacion
+import perfilado
+from aislamiento import es_error, peso_extraccion
+from almacen import guardar_evaluacion, hash_perfil, indexar_soportes
+from deduplicacion import hash_contenido, deduplicar_soportes
+from prefiltro import MODELO_PREFILTRO, prefiltrar, resultado_prefiltro
+
+# --- MOTOR DE EVALUACIÓN (compartido por Flask, ASGI, Streamlit y la línea de comandos) ---
+# Una evaluación pasa por etapas explícitas:
+#   ingesta      documentos recibidos (bytes) y precargados, con su hash
+#   extraccion   texto e imagen de cada documento distinto (ejecutor + caché)
+#   optimizacion deduplicación de soportes, prefiltro local e indexación de evidencia
+#   prompt       preflight de tokens, resumen por partes si hace falta y armado del prompt
+#   inferencia   llamada al modelo (con reintentos)
+#   parseo       concepto a partir de la respuesta (o del prefiltro)
+#   exportacion  historial (almacen.py) y, si se pide, Excel de IDONEIDAD
+# Lo que cambia entre front ends es la variante de salida:
+#   "auditoria"  informe Markdown del auditor, solo texto (auditoria.py): Flask y ASGI
+#   "idoneidad"  concepto JSON multimodal con experiencia_lista (evaluacion.py):
+#                Streamlit y la línea de comandos
+# El paralelismo y la caché se configuran aquí, una sola vez:
+#   MOTOR_EJECUTOR           serial | hilos | procesos | asyncio (defecto hilos)
+#   MOTOR_TRABAJADORES       hilos o procesos del ejecutor
+#   MOTOR_CACHE_EXTRACCION_MB  memoria para los documentos extraídos que se recuerdan
+#                              por hash (0 = sin caché); se cuenta texto + imagen
+# bench_motor.py compara los ejecutores sobre los mismos documentos.
+
+MOTOR_EJECUTOR = os.environ.get("MOTOR_EJECUTOR", "hilos")
+MOTOR_TRABAJADORES = int(os.environ.get("MOTOR_TRABAJADORES",
+                                        os.environ.get("EXTRACCION_HILOS", os.cpu_count() or 2)))
+MOTOR_CACHE_EXTRACCION_MB = float(os.environ.get("MOTOR_CACHE_EXTRACCION_MB", 128))
+
+# Para pruebas de carga sin consumir cuota: si se define, el modelo no se
+# llama y la respuesta llega tras esta cantidad de segundos.
+LATENCIA_SIMULADA = float(os.environ.get("LATENCIA_SIMULADA_S", "0") or 0)
+
+ETAPAS = ["ingesta", "extraccion", "optimizacion", "prompt", "inferencia", "parseo", "exportacion"]
+
+
+class RequisitosFaltantes(Exception):
+    """La solicitud no trae requisitos (ni texto ni PDF legible)."""
+
+
+class EvaluacionRechazada(Exception):
+    """El preflight determinó que la evaluación no cabe ni fragmentando."""
+
+    def __init__(self, ruta):
+        super().__init__(ruta["motivo"])
+        self.ruta = ruta
+
+
+# --- EJECUTORES ---
+# Todos exponen submit() (concurrent.futures.Future), map() y map_async().
+# Las tareas en hilos heredan el contexto de quien las envía y, si la
+# solicitud se está perfilando, su hilo se muestrea mientras dura la tarea
+# (perfilado.en_hilo).
+class Ejecutor(ABC):
+    nombre = None
+
+    @abstractmethod
+    def submit(self, funcion, *args):
+        """Envía funcion(*args); retorna un concurrent.futures.Future."""
+
+    def map(self, funcion, *iterables):
+        futuros = [self.submit(funcion, *args) for args in zip(*iterables)]
+        return [f.result() for f in futuros]
+
+    async def map_async(self, funcion, *iterables):
+        futuros = [self.submit(funcion, *args) for args in zip(*iterables)]
+        return list(await asyncio.gather(*(asyncio.wrap_future(f) for f in futuros)))
+
+    def cerrar(self):
+        pass
+
+
+class EjecutorSerial(Ejecutor):
+    """Todo en el hilo que llama: útil para depurar y perfilar."""
+    nombre = "serial"
+
+    def submit(self, funcion, *args):
+        futuro = Future()
+        try:
+            futuro.set_result(funcion(*args))
+        except Exception as e:
+            futuro.set_exception(e)
+        return futuro
+
+
+class EjecutorHilos(Ejecutor):
+    nombre = "hilos"
+
+    def __init__(self, trabajadores=MOTOR_TRABAJADORES):
+        self._pool = ThreadPoolExecutor(max_workers=trabajadores, thread_name_prefix="motor")
+
+    def submit(self, funcion, *args):
+        return self._pool.submit(contextvars.copy_context().run, perfilado.en_hilo, funcion, *args)
+
+    def cerrar(self):
+        self._pool.shutdown(wait=False)
+
+
+class EjecutorProcesos(Ejecutor):
+    """Procesos (spawn): las funciones y sus argumentos deben poder serializarse."""
+    nombre = "procesos"
+
+    def __init__(self, trabajadores=MOTOR_TRABAJADORES):
+        self._pool = ProcessPoolExecutor(max_workers=trabajadores,
+                                         mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(self, funcion, *args):
+        return self._pool.submit(funcion, *args)
+
+    def cerrar(self):
+        self._pool.shutdown(wait=False)
+
+
+class EjecutorAsyncio(Ejecutor):
+    """Event loop propio en un hilo de fondo.
+
+    El trabajo bloqueante corre en los hilos del loop (asyncio.to_thread) y
+    la inferencia usa el cliente asíncrono de Gemini sobre este loop. En el
+    camino síncrono (Motor.ejecutar) el hilo que llama igual queda esperando
+    la respuesta: solo el camino asíncrono (Motor.ejecutar_async, app_asgi.py)
+    espera al modelo sin ocupar un hilo por evaluación.
+    """
+    nombre = "asyncio"
+
+    def __init__(self, trabajadores=MOTOR_TRABAJADORES):
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(ThreadPoolExecutor(max_workers=trabajadores, thread_name_prefix="motor"))
+        self._hilo = threading.Thread(target=self._loop.run_forever, name="motor-asyncio", daemon=True)
+        self._hilo.start()
+
+    def correr(self, corrutina):
+        """Ejecuta la corrutina en el loop del ejecutor; retorna un Future."""
+        return asyncio.run_coroutine_threadsafe(corrutina, self._loop)
+
+    def submit(self, funcion, *args):
+        contexto = contextvars.copy_context()
+        return self.correr(asyncio.to_thread(contexto.run, perfilado.en_hilo, funcion, *args))
+
+    def cerrar(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+EJECUTORES = {e.nombre: e for e in (EjecutorSerial, EjecutorHilos, EjecutorProcesos, EjecutorAsyncio)}
+
+
+def crear_ejecutor(nombre=MOTOR_EJECUTOR, trabajadores=MOTOR_TRABAJADORES):
+    if nombre not in EJECUTORES:
+        raise ValueError(f"Ejecutor desconocido: {nombre} (opciones: {', '.join(EJECUTORES)})")
+    return EjecutorSerial() if nombre == "serial" else EJECUTORES[nombre](trabajadores)
+
+
+# --- CACHÉ DE EXTRACCIÓN ---
+class CacheExtraccion:
+    """LRU en memoria de documentos extraídos, por (tipo de lectura, hash), acotada en MB."""
+
+    def __init__(self, maximo_mb=MOTOR_CACHE_EXTRACCION_MB):
+        self.maximo = int(maximo_mb * 2**20)
+        self.ocupado = 0
+        self._datos = OrderedDict()  # clave -> (valor, peso)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            if clave in self._datos:
+                self._datos.move_to_end(clave)
+                self.aciertos += 1
+                return self._datos[clave][0]
+            self.fallos += 1
+            return None
+
+    def guardar(self, clave, valor):
+        """Recuerda un documento extraído; los errores de extracción no (pueden ser transitorios)."""
+        peso = peso_extraccion(valor)
+        if not self.maximo or peso > self.maximo or es_error(valor):
+            return
+        with self._lock:
+            if clave in self._datos:
+                self.ocupado -= self._datos.pop(clave)[1]
+            self._datos[clave] = (valor, peso)
+            self.ocupado += peso
+            while self.ocupado > self.maximo:
+                self.ocupado -= self._datos.popitem(last=False)[1][1]
+
+
+_compartidos = {}
+_compartidos_lock = threading.Lock()
+
+
+def ejecutor_compartido():
+    """Ejecutor del proceso (MOTOR_EJECUTOR); también lo usa la precarga."""
+    with _compartidos_lock:
+        if "ejecutor" not in _compartidos:
+            _compartidos["ejecutor"] = crear_ejecutor()
+        return _compartidos["ejecutor"]
+
+
+def cache_compartida():
+    with _compartidos_lock:
+        if "cache" not in _compartidos:
+            _compartidos["cache"] = CacheExtraccion()
+        return _compartidos["cache"]
+
+
+def configurar(ejecutor=None, trabajadores=None, cache=None):
+    """Reemplaza el ejecutor y/o la caché del proceso (ej. desde la línea de comandos).
+
+    cache: MB de la caché de extracción.
+    """
+    with _compartidos_lock:
+        if ejecutor or trabajadores:
+            anterior = _compartidos.pop("ejecutor", None)
+            if anterior:
+                anterior.cerrar()
+            _compartidos["ejecutor"] = crear_ejecutor(ejecutor or MOTOR_EJECUTOR,
+                                                      trabajadores or MOTOR_TRABAJADORES)
+        if cache is not None:
+            _compartidos["cache"] = CacheExtraccion(cache)
+
+
+# Funciones de extracción de nivel de módulo (el ejecutor de procesos las serializa)
+def extraer_soporte(tipo, data):
+    """(texto, imagen) de un soporte PDF o imagen."""
+    return evaluacion.leer_soporte(tipo, data)
+
+
+def extraer_requisitos(data):
+    return evaluacion.extraer_texto_pdf(io.BytesIO(data))
+
+
+# --- VARIANTES DE SALIDA ---
+class _Auditoria:
+    nombre = "auditoria"
+    simulada = "Análisis simulado."
+    formato_requisitos = staticmethod(auditoria.formato_requisitos)
+
+    @staticmethod
+    def planificar(ev):
+        return auditoria.planificar_auditoria(ev.nombre, ev.identificacion, ev.requisitos, ev.unicos, ev.consumo)
+
+    @staticmethod
+    async def planificar_async(ev):
+        return await auditoria.planificar_auditoria_async(ev.nombre, ev.identificacion, ev.requisitos,
+                                                          ev.unicos, ev.consumo)
+
+    @staticmethod
+    def inferir(ev):
+        return auditoria.generar_analisis(auditoria.crear_modelo(ev.modelo), ev.contenido, ev.consumo)
+
+    @staticmethod
+    async def inferir_async(ev):
+        return await auditoria.generar_analisis_async(auditoria.crear_modelo(ev.modelo), ev.contenido,
+                                                      ev.consumo)
+
+    @staticmethod
+    def interpretar(respuesta):
+        return respuesta, auditoria.concepto_de_analisis(respuesta)
+
+    @staticmethod
+    def prefiltrado(ev):
+        analisis = resultado_prefiltro(ev.nombre, ev.identificacion, ev.fallos,
+                                       ev.solicitud.prefiltro)["analisis_detallado_markdown"]
+        return analisis, auditoria.concepto_de_analisis(analisis)
+
+    @staticmethod
+    def guardar(ev):
+        auditoria.registrar_auditoria(ev.nombre, ev.identificacion, ev.perfil_hash, ev.resultado, ev.omitidos,
+                                      ev.soportes, tiempos=ev.tiempos, origen=ev.solicitud.origen,
+                                      modelo=ev.modelo, prefiltro=ev.fallos, consumo=ev.consumo)
+
+
+class _Idoneidad:
+    nombre = "idoneidad"
+    simulada = '{"concepto_final": "NO CUMPLE", "idoneidad_texto": "Evaluación simulada.", "experiencia_lista": []}'
+    formato_requisitos = staticmethod(evaluacion.formato_requisitos)
+
+    @staticmethod
+    def planificar(ev):
+        return evaluacion.planificar_evaluacion(ev.nombre, ev.identificacion, ev.requisitos, ev.unicos,
+                                                ev.consumo)
+
+    @staticmethod
+    async def planificar_async(ev):
+        return await asyncio.to_thread(_Idoneidad.planificar, ev)
+
+    @staticmethod
+    def inferir(ev):
+        return evaluacion.generar_respuesta(ev.contenido, ev.modelo, ev.consumo)
+
+    @staticmethod
+    async def inferir_async(ev):
+        return await evaluacion.generar_respuesta_async(ev.contenido, ev.modelo, ev.consumo)
+
+    @staticmethod
+    def interpretar(respuesta):
+        data_json = evaluacion.clean_and_parse_json(respuesta)
+        return data_json, data_json.get("concepto_final")
+
+    @staticmethod
+    def prefiltrado(ev):
+        data_json = resultado_prefiltro(ev.nombre, ev.identificacion, ev.fallos, ev.solicitud.prefiltro)
+        return data_json, data_json["concepto_final"]
+
+    @staticmethod
+    def guardar(ev):
+        guardar_evaluacion(
+            cedula=ev.identificacion,
+            nombre=ev.nombre,
+            perfil_hash=ev.perfil_hash,
+            modelo=ev.modelo,
+            resultado=ev.resultado,
+            concepto=ev.concepto,
+            tiempos=ev.tiempos,
+            documentos=[{"nombre": s["nombre"], "hash": s["hash"]} for s in ev.soportes],
+            origen=ev.solicitud.origen,
+            consumo=ev.consumo,
+        )
+
+
+VARIANTES = {v.nombre: v for v in (_Auditoria, _Idoneidad)}
+
+
+# --- SOLICITUD Y ESTADO DE UNA EVALUACIÓN ---
+class Solicitud:
+    """Entrada de una evaluación, independiente del front end.
+
+    - documentos: [(nombre, tipo MIME, bytes)] recibidos en la solicitud.
+    - precargados: soportes ya extraídos ({'nombre', 'hash', 'texto', 'imagen'}, ver precarga.py).
+    - requisitos_pdf (nombre, bytes), requisitos_precargado ({'nombre', 'texto'}
+      ya extraído; la línea de comandos lo reutiliza entre candidatos) y/o
+      requisitos_texto.
+    - modelo: fuerza un modelo (por defecto lo elige el preflight).
+    - plantilla: ruta de la plantilla Excel de IDONEIDAD (solo variante "idoneidad").
+    - tiempos: segundos de etapas previas al motor, ej. {"cola": 0.4}.
+    """
+
+    def __init__(self, nombre, identificacion, documentos=(), precargados=(), requisitos_texto=None,
+                 requisitos_pdf=None, requisitos_precargado=None,
+                 origen=None, prefiltro=None, modelo=None, plantilla=None, tiempos=None):
+        self.nombre = nombre
+        self.identificacion = identificacion
+        self.documentos = list(documentos)
+        self.precargados = list(precargados)
+        self.requisitos_texto = requisitos_texto
+        self.requisitos_pdf = requisitos_pdf
+        self.requisitos_precargado = requisitos_precargado
+        self.origen = origen
+        self.prefiltro = prefiltro
+        self.modelo = modelo
+        self.plantilla = plantilla
+        self.tiempos = dict(tiempos or {})
+
+
+class Evaluacion:
+    """Estado que recorre las etapas; al final, el resultado para el front end.
+
+    resultado: informe Markdown (variante "auditoria") o dict JSON ("idoneidad").
+    avisos: fallos no fatales (indexación, historial) para mostrar o registrar.
+    """
+
+    def __init__(self, solicitud):
+        self.solicitud = solicitud
+        self.nombre = solicitud.nombre
+        self.identificacion = solicitud.identificacion
+        self.documentos = []
+        self.requisitos = ""
+        self.perfil_hash = None
+        self.soportes = []
+        self.unicos = []
+        self.omitidos = []
+        self.fallos = []
+        self.ruta = None
+        self.contenido = None
+        self.modelo = None
+        self.respuesta = None
+        self.resultado = None
+        self.concepto = None
+        self.consumo = {}
+        self.excel = None
+        self.error_excel = None
+        self.avisos = []
+        self.etapas = {}
+        self.tiempos = dict(solicitud.tiempos)
+
+    @contextmanager
+    def etapa(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.etapas[nombre] = round(self.etapas.get(nombre, 0) + time.perf_counter() - inicio, 3)
+
+    def _cerrar_tiempos(self):
+        # Claves históricas ("extraccion", "modelo") para el historial y analitica.py
+        self.tiempos["extraccion"] = round(sum(self.etapas.get(e, 0) for e in ETAPAS[:3]), 3)
+        self.tiempos["modelo"] = round(sum(self.etapas.get(e, 0) for e in ETAPAS[3:6]), 3)
+        self.tiempos["etapas"] = dict(self.etapas)
+
+
+# --- MOTOR ---
+class Motor:
+    """Ejecuta las etapas de una evaluación para una variante de salida.
+
+    preparar() cubre ingesta, extracción y optimización (CPU); completar()
+    el prompt, la inferencia, el parseo y la exportación (red). ejecutar()
+    hace ambas; la línea de comandos las separa para solapar candidatos.
+    """
+
+    def __init__(self, variante, ejecutor=None, cache=None, reintentos=0):
+        self.variante = VARIANTES[variante]
+        self.ejecutor = ejecutor or ejecutor_compartido()
+        self.cache = cache or cache_compartida()
+        self.reintentos = reintentos
+
+    # --- ingesta ---
+    def _ingesta(self, ev):
+        s = ev.solicitud
+        ev.documentos = [{"nombre": nombre, "tipo": tipo, "data": data, "hash": hash_contenido(data)}
+                         for nombre, tipo, data in s.documentos]
+        if s.requisitos_pdf:
+            nombre_pdf, data_pdf = s.requisitos_pdf
+            ev.documentos.append({"nombre": nombre_pdf, "tipo": "requisitos", "data": data_pdf,
+                                  "hash": hash_contenido(data_pdf)})
+
+    # --- extracción ---
+    def _pendientes(self, ev):
+        """Documentos distintos a extraer y los ya extraídos en caché, por (tipo, hash)."""
+        pendientes, extraidos = {}, {}
+        for doc in ev.documentos:
+            clave = (doc["tipo"], doc["hash"])
+            if clave in pendientes or clave in extraidos:
+                continue
+            valor = self.cache.obtener(clave)
+            if valor is None:
+                pendientes[clave] = doc
+            else:
+                extraidos[clave] = valor
+        return pendientes, extraidos
+
+    @staticmethod
+    def _extraer(tipo, data):
+        if tipo == "requisitos":
+            return extraer_requisitos(data)
+        return extraer_soporte(tipo, data)
+
+    def _ensamblar(self, ev, extraidos, nuevos):
+        for clave, valor in nuevos.items():
+            self.cache.guardar(clave, valor)
+        extraidos.update(nuevos)
+        s = ev.solicitud
+        texto_pdf, nombre_pdf = None, None
+        soportes = [{"tipo": "application/pdf", **p} for p in s.precargados]
+        for doc in ev.documentos:
+            clave = (doc["tipo"], doc["hash"])
+            valor = extraidos[clave]
+            if doc["tipo"] == "requisitos":
+                nombre_pdf, texto_pdf = doc["nombre"], valor
+            else:
+                texto, imagen = valor
+                soportes.append({"nombre": doc["nombre"], "hash": doc["hash"], "tipo": doc["tipo"],
+                                 "texto": texto, "imagen": imagen})
+        if s.requisitos_precargado and texto_pdf is None:
+            nombre_pdf, texto_pdf = s.requisitos_precargado["nombre"], s.requisitos_precargado["texto"]
+        ev.requisitos = self.variante.formato_requisitos(nombre_pdf, texto_pdf, s.requisitos_texto)
+        ev.perfil_hash = hash_perfil(texto_pdf, s.requisitos_texto)
+        ev.soportes = soportes
+
+    def _extraccion(self, ev):
+        pendientes, extraidos = self._pendientes(ev)
+        valores = self.ejecutor.map(self._extraer, [d["tipo"] for d in pendientes.values()],
+                                    [d["data"] for d in pendientes.values()])
+        self._ensamblar(ev, extraidos, dict(zip(pendientes, valores)))
+
+    async def _extraccion_async(self, ev):
+        pendientes, extraidos = self._pendientes(ev)
+        valores = await self.ejecutor.map_async(self._extraer, [d["tipo"] for d in pendientes.values()],
+                                                [d["data"] for d in pendientes.values()])
+        self._ensamblar(ev, extraidos, dict(zip(pendientes, valores)))
+
+    # --- optimización ---
+    def _optimizacion(self, ev):
+        if not ev.requisitos.strip():
+            raise RequisitosFaltantes("Debes proporcionar los requisitos (Texto o PDF).")
+        # Solo un representante de cada grupo de duplicados va al prompt
+        ev.unicos, ev.omitidos = deduplicar_soportes(ev.soportes)
+        # Prefiltro: un requisito ausente de forma demostrable evita la llamada al modelo
+        ev.fallos = prefiltrar(ev.requisitos, ev.unicos, ev.solicitud.prefiltro)
+        # Indexar la evidencia para búsquedas futuras (aunque luego falle el modelo)
+        try:
+            indexar_soportes(ev.identificacion, ev.nombre, ev.unicos)
+        except Exception as e:
+            ev.avisos.append(f"No se pudo indexar la evidencia: {e}")
+
+    # --- prompt ---
+    def _fijar_ruta(self, ev, ruta, contenido):
+        if ruta["modo"] == "rechazado":
+            raise EvaluacionRechazada(ruta)
+        ev.ruta, ev.contenido = ruta, contenido
+        ev.modelo = ev.solicitud.modelo or ruta["modelo"]
+
+    # --- parseo ---
+    def _parseo(self, ev):
+        if ev.fallos:
+            ev.resultado, ev.concepto = self.variante.prefiltrado(ev)
+        else:
+            ev.resultado, ev.concepto = self.variante.interpretar(ev.respuesta)
+
+    # --- exportación ---
+    def _exportacion(self, ev):
+        ev._cerrar_tiempos()
+        # Guardar en el historial (un fallo aquí no debe dañar la evaluación)
+        try:
+            self.variante.guardar(ev)
+        except Exception as e:
+            ev.avisos.append(f"No se pudo guardar en el historial: {e}")
+        if ev.solicitud.plantilla and self.variante is _Idoneidad:
+            ev.excel, ev.error_excel = evaluacion.fill_excel_template(ev.resultado, ev.solicitud.plantilla)
+
+    # --- camino síncrono ---
+    def preparar(self, solicitud):
+        ev = Evaluacion(solicitud)
+        with ev.etapa("ingesta"):
+            self._ingesta(ev)
+        with ev.etapa("extraccion"):
+            self._extraccion(ev)
+        with ev.etapa("optimizacion"):
+            self._optimizacion(ev)
+        return ev
+
+    def _inferir(self, ev):
+        if LATENCIA_SIMULADA:
+            time.sleep(LATENCIA_SIMULADA)
+            return self.variante.simulada
+        if isinstance(self.ejecutor, EjecutorAsyncio):
+            return self.ejecutor.correr(self.variante.inferir_async(ev)).result()
+        return self.variante.inferir(ev)
+
+    def completar(self, ev):
+        if ev.fallos:
+            ev.modelo = MODELO_PREFILTRO
+            with ev.etapa("parseo"):
+                self._parseo(ev)
+        else:
+            with ev.etapa("prompt"):
+                self._fijar_ruta(ev, *self.variante.planificar(ev))
+            for intento in range(self.reintentos + 1):
+                try:
+                    with ev.etapa("inferencia"):
+                        ev.respuesta = self._inferir(ev)
+                    with ev.etapa("parseo"):
+                        self._parseo(ev)
+                    break
+                except Exception:
+                    if intento == self.reintentos:
+                        raise
+                    time.sleep(2 ** intento)
+        with ev.etapa("exportacion"):
+            self._exportacion(ev)
+        return ev
+
+    def ejecutar(self, solicitud):
+        return self.completar(self.preparar(solicitud))
+
+    # --- camino asíncrono (ASGI) ---
+    async def preparar_async(self, solicitud):
+        ev = Evaluacion(solicitud)
+        with ev.etapa("ingesta"):
+            await asyncio.to_thread(self._ingesta, ev)
+        with ev.etapa("extraccion"):
+            await self._extraccion_async(ev)
+        with ev.etapa("optimizacion"):
+            await asyncio.to_thread(self._optimizacion, ev)
+        return ev
+
+    async def completar_async(self, ev):
+        if ev.fallos:
+            ev.modelo = MODELO_PREFILTRO
+            with ev.etapa("parseo"):
+                self._parseo(ev)
+        else:
+            with ev.etapa("prompt"):
+                self._fijar_ruta(ev, *await self.variante.planificar_async(ev))
+            for intento in range(self.reintentos + 1):
+                try:
+                    with ev.etapa("inferencia"):
+                        if LATENCIA_SIMULADA:
+                            await asyncio.sleep(LATENCIA_SIMULADA)
+                            ev.respuesta = self.variante.simulada
+                        else:
+                            ev.respuesta = await self.variante.inferir_async(ev)
+                    with ev.etapa("parseo"):
+                        self._parseo(ev)
+                    break
+                except Exception:
+                    if intento == self.reintentos:
+                        raise
+                    await asyncio.sleep(2 ** intento)
+        with ev.etapa("exportacion"):
+            await asyncio.to_thread(self._exportacion, ev)
+        return ev
+
+    async def ejecutar_async(self, solicitud):
+        return await self.completar_async(await self.preparar_async(solicitud))
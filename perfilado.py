@@ -0,0 +1,323 @@
+import contextvars
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+# --- PERFILADO BAJO DEMANDA DE UNA EVALUACIÓN ---
+# Cuando una evaluación concreta es lenta en producción, se puede perfilar
+# solo esa solicitud (cabecera X-Perfilar con X-Perfilar-Clave en Flask,
+# interruptor de depuración en Streamlit; "X-Perfilar: cpu" omite la memoria):
+#   - CPU: un hilo muestrea cada PERFILADO_INTERVALO_MS la pila del hilo que
+#     atiende la solicitud (sys._current_frames) y la de los hilos del motor
+#     mientras ejecutan una tarea de esa solicitud (ver en_hilo). La
+#     extracción de PDFs corre en procesos aislados (aislamiento.py): allí se
+#     muestrea también y las pilas se agregan bajo "[proceso de extracción]".
+#   - Memoria: diferencia de tracemalloc entre el inicio y el fin, por línea,
+#     y el pico de memoria trazada. tracemalloc es de todo el proceso: si hay
+#     otras solicitudes en curso, sus asignaciones también aparecen. Trazar
+#     cada asignación es lo costoso (el simhash de deduplicacion.py crea
+#     millones de enteros): con memoria la evaluación puede tardar varias
+#     veces más; solo CPU, casi lo mismo.
+# El resultado se guarda en PERFILADOS_DIR (JSON, con las pilas en formato
+# "plegado" para flamegraph.pl o speedscope) y se descarga por su id.
+# Sin perfilado activo el costo es una consulta a un ContextVar.
+
+PERFILADOS_DIR = os.environ.get("PERFILADOS_DIR", "perfilados")
+MAX_PERFILADOS = int(os.environ.get("MAX_PERFILADOS", 50))
+PERFILADO_INTERVALO_MS = float(os.environ.get("PERFILADO_INTERVALO_MS", 5))
+# Marcos de pila que guarda tracemalloc por asignación. El reporte agrupa por
+# la línea más interna, así que más marcos solo agregan costo.
+PERFILADO_MARCOS = int(os.environ.get("PERFILADO_MARCOS", 1))
+# La cabecera X-Perfilar solo se atiende si se define esta clave y la
+# cabecera X-Perfilar-Clave la trae: el trazado de memoria es de todo el
+# proceso y frena también las solicitudes de los demás usuarios.
+PERFILADO_CLAVE = os.environ.get("PERFILADO_CLAVE", "")
+
+TOP_FUNCIONES = 30
+TOP_MEMORIA = 30
+RE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+logger = logging.getLogger(__name__)
+
+_actual = contextvars.ContextVar("perfilado_actual", default=None)
+
+_trazado_lock = threading.Lock()
+_trazado_usuarios = 0
+_trazado_propio = False
+
+
+def solicitado(headers):
+    """Modo pedido en las cabeceras: None, "cpu" o "completo" (CPU y memoria).
+
+    X-Perfilar: cpu | 1 (completo). Sin PERFILADO_CLAVE configurada, o si
+    X-Perfilar-Clave no coincide, la cabecera se ignora.
+    """
+    valor = (headers.get("X-Perfilar") or "").strip().lower()
+    if not valor or valor in ("0", "no", "false"):
+        return None
+    if not PERFILADO_CLAVE or headers.get("X-Perfilar-Clave") != PERFILADO_CLAVE:
+        return None
+    return "cpu" if valor == "cpu" else "completo"
+
+
+def actual():
+    """Perfilado en curso en este contexto, o None."""
+    return _actual.get()
+
+
+# --- Muestreo de CPU ---
+def _pila(frame):
+    # Raíz primero, en el formato plegado: "funcion (archivo:linea);..."
+    marcos = []
+    while frame is not None:
+        codigo = frame.f_code
+        marcos.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(marcos))
+
+
+class Muestreador:
+    """Hilo que cuenta las pilas de un hilo objetivo (y de sus ayudantes) cada `intervalo` segundos."""
+
+    def __init__(self, hilo_id, intervalo):
+        self.hilo_id = hilo_id
+        self.ayudantes = set()  # Hilos de pool trabajando para el hilo objetivo
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, name="perfilado", daemon=True)
+
+    def _muestrear(self):
+        while not self._detener.wait(self.intervalo):
+            frames = sys._current_frames()
+            if self.hilo_id not in frames:
+                return
+            for hilo_id in (self.hilo_id, *self.ayudantes):
+                frame = frames.get(hilo_id)
+                if frame is not None:
+                    self.pilas[_pila(frame)] += 1
+            del frames, frame
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        self._hilo.join()
+        return self.pilas
+
+
+# --- Memoria (tracemalloc compartido entre perfilados simultáneos) ---
+def _iniciar_trazado():
+    global _trazado_usuarios, _trazado_propio
+    with _trazado_lock:
+        if not _trazado_usuarios:
+            _trazado_propio = not tracemalloc.is_tracing()
+            if _trazado_propio:
+                tracemalloc.start(PERFILADO_MARCOS)
+            tracemalloc.reset_peak()
+        _trazado_usuarios += 1
+        return tracemalloc.take_snapshot()
+
+
+def _detener_trazado():
+    global _trazado_usuarios
+    with _trazado_lock:
+        snapshot = tracemalloc.take_snapshot()
+        pico = tracemalloc.get_traced_memory()[1]
+        _trazado_usuarios -= 1
+        if not _trazado_usuarios and _trazado_propio:
+            tracemalloc.stop()
+        return snapshot, pico
+
+
+def _diferencia_memoria(antes, despues):
+    filtros = [tracemalloc.Filter(False, tracemalloc.__file__),
+               tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+               tracemalloc.Filter(False, __file__)]
+    estadisticas = despues.filter_traces(filtros).compare_to(antes.filter_traces(filtros), "lineno")
+    return [{"linea": str(e.traceback[0]), "bytes": e.size_diff, "bloques": e.count_diff,
+             "bytes_total": e.size}
+            for e in estadisticas[:TOP_MEMORIA] if e.size_diff]
+
+
+def perfilar_llamada(funcion, args, intervalo, memoria):
+    """Ejecuta funcion(*args) perfilada en el hilo actual; retorna (valor, parcial).
+
+    Pensada para los procesos de extracción: el proceso padre agrega el
+    parcial a su perfilado con Perfilado.agregar().
+    """
+    muestreador = Muestreador(threading.get_ident(), intervalo)
+    antes = _iniciar_trazado() if memoria else None
+    muestreador.iniciar()
+    try:
+        valor = funcion(*args)
+    finally:
+        pilas = muestreador.detener()
+        parcial = {"pilas": dict(pilas)}
+        if memoria:
+            despues, pico = _detener_trazado()
+            parcial.update(memoria=_diferencia_memoria(antes, despues), pico_bytes=pico)
+    return valor, parcial
+
+
+class Perfilado:
+    """Perfil de CPU y memoria de una solicitud."""
+
+    def __init__(self, etiqueta, memoria=True, intervalo_ms=PERFILADO_INTERVALO_MS):
+        self.id = uuid.uuid4().hex
+        self.etiqueta = etiqueta
+        self.memoria = memoria
+        self.intervalo = intervalo_ms / 1000
+        self.pilas = Counter()
+        self.procesos = []  # Parciales de los procesos de extracción
+        self._lock = threading.Lock()
+        self._muestreador = None
+        self._antes = None
+        self.inicio = None
+        self._inicio_reloj = None
+        self.resultado = None
+
+    def iniciar(self):
+        self.inicio = time.time()
+        self._inicio_reloj = time.perf_counter()
+        if self.memoria:
+            self._antes = _iniciar_trazado()
+        self._muestreador = Muestreador(threading.get_ident(), self.intervalo)
+        self._muestreador.iniciar()
+
+    @contextmanager
+    def en_hilo(self):
+        """Muestrea también el hilo actual mientras dura el bloque (tareas en pools de hilos)."""
+        hilo_id = threading.get_ident()
+        self._muestreador.ayudantes.add(hilo_id)
+        try:
+            yield
+        finally:
+            self._muestreador.ayudantes.discard(hilo_id)
+
+    def agregar(self, parcial, prefijo="[proceso de extracción]"):
+        """Suma las pilas y la memoria medidas en otro proceso (ver perfilar_llamada)."""
+        with self._lock:
+            for pila, muestras in parcial["pilas"].items():
+                self.pilas[f"{prefijo};{pila}"] += muestras
+            if "memoria" in parcial:
+                self.procesos.append({"memoria": parcial["memoria"], "pico_bytes": parcial["pico_bytes"]})
+
+    def detener(self):
+        pilas = self._muestreador.detener()
+        memoria = None
+        if self.memoria:
+            despues, pico = _detener_trazado()
+            memoria = {
+                "pico_bytes": pico,
+                "asignaciones": _diferencia_memoria(self._antes, despues),
+                "procesos_extraccion": self.procesos,
+            }
+        duracion = time.perf_counter() - self._inicio_reloj
+        with self._lock:
+            self.pilas.update(pilas)
+            self.resultado = {
+                "id": self.id,
+                "etiqueta": self.etiqueta,
+                "inicio": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.inicio)),
+                "duracion_s": round(duracion, 3),
+                "intervalo_ms": self.intervalo * 1000,
+                "muestras": sum(self.pilas.values()),
+                "funciones": _funciones(self.pilas),
+                "memoria": memoria,
+                "pilas_plegadas": [f"{pila} {n}" for pila, n in self.pilas.most_common()],
+            }
+        self._antes = None
+        return self.resultado
+
+    def guardar(self, directorio=None):
+        directorio = directorio or PERFILADOS_DIR
+        os.makedirs(directorio, exist_ok=True)
+        with open(os.path.join(directorio, f"{self.id}.json"), "w", encoding="utf-8") as f:
+            json.dump(self.resultado, f, ensure_ascii=False)
+        _podar(directorio)
+
+
+def _funciones(pilas):
+    """Funciones más costosas: muestras propias (en la cima de la pila) e inclusivas."""
+    propias, inclusivas = Counter(), Counter()
+    for pila, n in pilas.items():
+        marcos = pila.split(";")
+        propias[marcos[-1]] += n
+        for marco in set(marcos):
+            inclusivas[marco] += n
+    total = sum(pilas.values()) or 1
+    return [{"funcion": f, "inclusivas": n, "propias": propias[f], "porcentaje": round(100 * n / total, 1)}
+            for f, n in inclusivas.most_common(TOP_FUNCIONES)]
+
+
+def _podar(directorio):
+    archivos = sorted((os.path.join(directorio, a) for a in os.listdir(directorio) if a.endswith(".json")),
+                      key=os.path.getmtime)
+    for ruta in archivos[:-MAX_PERFILADOS]:
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+
+@contextmanager
+def perfilar(etiqueta, modo="completo"):
+    """Perfila el bloque según `modo` (None, "cpu" o "completo"); entrega el
+    Perfilado (o None) y lo guarda al salir.
+
+    Un fallo del perfilado nunca interrumpe la evaluación: solo se registra.
+    """
+    if not modo:
+        yield None
+        return
+    perfilado = Perfilado(etiqueta, memoria=modo == "completo")
+    perfilado.iniciar()
+    token = _actual.set(perfilado)
+    try:
+        yield perfilado
+    finally:
+        _actual.reset(token)
+        try:
+            perfilado.detener()
+            perfilado.guardar()
+        except Exception as e:
+            logger.warning("No se pudo guardar el perfilado %s: %s", perfilado.id, e)
+
+
+def en_hilo(funcion, *args):
+    """Ejecuta funcion(*args) incluyendo el hilo actual en el perfilado en curso, si lo hay.
+
+    Para las tareas que un pool de hilos corre en nombre de una solicitud
+    perfilada (el ContextVar debe venir copiado del hilo que la envía).
+    """
+    perfil = _actual.get()
+    if perfil is None or perfil._muestreador is None:
+        return funcion(*args)
+    with perfil.en_hilo():
+        return funcion(*args)
+
+
+def cargar(perfilado_id, directorio=None):
+    """Resultado guardado de un perfilado, o None si no existe (o el id no es válido)."""
+    if not RE_ID.match(perfilado_id or ""):
+        return None
+    ruta = os.path.join(directorio or PERFILADOS_DIR, f"{perfilado_id}.json")
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def pilas_plegadas(resultado):
+    """Texto en formato plegado (una pila por línea) para flamegraph.pl o speedscope."""
+    return "\n".join(resultado["pilas_plegadas"]) + "\n"
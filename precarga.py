@@ -0,0 +1,168 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+from admision import estimar_trabajo
+from aislamiento import es_error, leer_pdf, peso_extraccion
+from deduplicacion import hash_contenido
+
+# --- EXTRACCIÓN ANTICIPADA AL ELEGIR ARCHIVOS ---
+# index.html sube cada PDF apenas el usuario lo elige (POST /api/documentos).
+# La extracción arranca en segundo plano mientras se diligencian nombre e
+# identificación, y la validación referencia los documentos por su token: en
+# el camino crítico queda solo la llamada al modelo.
+# Los documentos viven en la memoria del proceso (el servidor corre con un
+# solo worker) y vencen tras TTL_PRECARGA_S; un token vencido o desconocido
+# se informa para que el navegador reenvíe el archivo.
+# La ruta no pasa por el control de admisión, así que la memoria se acota en
+# bytes: MAX_DOCUMENTO_MB por archivo y MAX_PRECARGA_MB en total (archivos
+# en espera de extracción más texto y miniaturas ya extraídos). Al llenarse se
+# descartan los documentos ya extraídos más antiguos; si todo está aún en
+# extracción, la subida se rechaza para que el navegador reintente.
+
+TTL_PRECARGA_S = int(os.environ.get("TTL_PRECARGA_S", 1800))
+MAX_PRECARGA_MB = float(os.environ.get("MAX_PRECARGA_MB", 256))
+MAX_DOCUMENTO_MB = float(os.environ.get("MAX_DOCUMENTO_MB", 20))
+REINTENTAR_PRECARGA_S = 5
+
+
+class DocumentosVencidos(Exception):
+    """Tokens que ya no están en memoria (vencidos, descartados o de otro proceso)."""
+
+    def __init__(self, tokens):
+        super().__init__(f"Documentos no disponibles: {', '.join(tokens)}")
+        self.tokens = tokens
+
+
+class DocumentoMuyGrande(Exception):
+    """El archivo supera MAX_DOCUMENTO_MB."""
+
+
+class PrecargaSaturada(Exception):
+    """No hay memoria para otra extracción anticipada mientras terminan las demás."""
+
+    def __init__(self, reintentar_en=REINTENTAR_PRECARGA_S):
+        super().__init__("Demasiados documentos en extracción; intente de nuevo en unos segundos.")
+        self.reintentar_en = reintentar_en
+
+
+def _fallido(futuro):
+    if not futuro.done():
+        return False
+    return futuro.cancelled() or futuro.exception() is not None or es_error(futuro.result())
+
+
+def _encadenar(origen, destino):
+    """Copia en `destino` el resultado (o la excepción) de `origen` al terminar."""
+    def copiar(f):
+        if f.cancelled():
+            destino.cancel()
+        elif f.exception() is not None:
+            destino.set_exception(f.exception())
+        else:
+            destino.set_result(f.result())
+    origen.add_done_callback(copiar)
+
+
+class Precarga:
+    """Documentos subidos por adelantado, con su extracción en un executor."""
+
+    def __init__(self, executor, ttl=TTL_PRECARGA_S, maximo_mb=MAX_PRECARGA_MB,
+                 maximo_documento_mb=MAX_DOCUMENTO_MB):
+        self.executor = executor
+        self.ttl = ttl
+        self.maximo = int(maximo_mb * 2**20)
+        self.maximo_documento = int(maximo_documento_mb * 2**20)
+        # token -> {"nombre", "hash", "futuro", "bytes", "peso", "trabajo", "creado"}
+        self._documentos = {}
+        self._lock = threading.Lock()
+
+    def subir(self, nombre, data):
+        """Registra un PDF y lanza su extracción. Retorna (token, hash)."""
+        if len(data) > self.maximo_documento:
+            raise DocumentoMuyGrande(f"El archivo supera {self.maximo_documento // 2**20} MB.")
+        doc_hash = hash_contenido(data)
+        token = uuid.uuid4().hex
+        trabajo = estimar_trabajo([data]) - 1
+        with self._lock:
+            # El mismo contenido subido dos veces comparte la extracción, salvo
+            # si falló (puede ser transitorio): entonces se vuelve a extraer
+            futuro = next((d["futuro"] for d in self._documentos.values()
+                           if d["hash"] == doc_hash and not _fallido(d["futuro"])), None)
+            if not self._purgar(0 if futuro else len(data)):
+                raise PrecargaSaturada()
+            # El envío al executor queda fuera del candado (puede bloquear):
+            # se reserva el lugar con un futuro que luego recibe el resultado
+            nuevo = futuro is None
+            if nuevo:
+                futuro = Future()
+            self._documentos[token] = {"nombre": nombre, "hash": doc_hash, "futuro": futuro,
+                                       "bytes": len(data), "peso": None,
+                                       "trabajo": trabajo, "creado": time.monotonic()}
+        if nuevo:
+            try:
+                _encadenar(self.executor.submit(leer_pdf, data), futuro)
+            except Exception as e:
+                futuro.set_exception(e)
+                with self._lock:
+                    self._documentos.pop(token, None)
+                raise
+        return token, doc_hash
+
+    @staticmethod
+    def _peso(documento):
+        # En extracción: los bytes del archivo; extraído: texto + miniatura
+        futuro = documento["futuro"]
+        if not futuro.done():
+            return documento["bytes"]
+        if documento["peso"] is None:
+            documento["peso"] = 0 if futuro.exception() else peso_extraccion(futuro.result())
+        return documento["peso"]
+
+    def _ocupado(self):
+        # Cada extracción cuenta una vez aunque varios tokens la compartan
+        return sum({id(d["futuro"]): self._peso(d) for d in self._documentos.values()}.values())
+
+    def _purgar(self, nuevo=0):
+        """Descarta vencidos y, si no cabe `nuevo`, los extraídos más antiguos. Retorna si cabe."""
+        limite = time.monotonic() - self.ttl
+        for token in [t for t, d in self._documentos.items() if d["creado"] < limite]:
+            del self._documentos[token]
+        # El dict conserva el orden de inserción: se descartan los más antiguos
+        while self._ocupado() + nuevo > self.maximo:
+            extraido = next((t for t, d in self._documentos.items() if d["futuro"].done()), None)
+            if extraido is None:
+                return False
+            del self._documentos[extraido]
+        return True
+
+    def _buscar(self, tokens):
+        with self._lock:
+            self._purgar()
+            faltantes = [t for t in tokens if t not in self._documentos]
+            if faltantes:
+                raise DocumentosVencidos(faltantes)
+            return [self._documentos[t] for t in tokens]
+
+    def trabajo(self, tokens):
+        """Unidades de trabajo estimadas de los documentos (ver admision.py); 1 si el token no existe."""
+        with self._lock:
+            return sum(self._documentos[t]["trabajo"] if t in self._documentos else 1 for t in tokens)
+
+    @staticmethod
+    def _soporte(documento, extraido):
+        texto, imagen = extraido
+        return {"nombre": documento["nombre"], "hash": documento["hash"], "texto": texto, "imagen": imagen}
+
+    def resolver(self, tokens):
+        """Soportes ({'nombre', 'hash', 'texto', 'imagen'}) de los tokens, esperando su extracción."""
+        documentos = self._buscar(tokens)
+        return [self._soporte(d, d["futuro"].result()) for d in documentos]
+
+    async def resolver_async(self, tokens):
+        documentos = self._buscar(tokens)
+        extraidos = await asyncio.gather(*(asyncio.wrap_future(d["futuro"]) for d in documentos))
+        return [self._soporte(d, e) for d, e in zip(documentos, extraidos)]
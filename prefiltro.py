@@ -0,0 +1,212 @@
+import os
+import re
+import unicodedata
+from datetime import date
+
+from deduplicacion import MIN_CARACTERES_TEXTO
+
+# --- PREFILTRO DETERMINISTA ---
+# Reglas locales sobre el texto ya extraído que descartan, sin llamar al
+# modelo, candidatos que claramente NO CUMPLEN:
+#   - "titulo": el perfil exige título profesional y ningún soporte menciona
+#     un título o grado,
+#   - "tarjeta": el perfil exige tarjeta/matrícula profesional (ej. COPNIA) y
+#     ningún soporte la menciona,
+#   - "experiencia": ni sumando el periodo más amplio que abarcan las fechas
+#     de cada soporte se alcanza el mínimo de meses del perfil.
+# Solo se dispara cuando la ausencia es demostrable: si algún soporte es una
+# imagen, un PDF escaneado o no se pudo leer, la evidencia podría estar ahí y
+# se deja la decisión al modelo. Lo mismo si un soporte trae fechas numéricas
+# que no se pueden interpretar (ej. años de dos dígitos): su periodo es
+# desconocido, no cero.
+# Un requisito solo cuenta como exigido si aparece en una oración sin
+# negación ("no requiere tarjeta profesional", "opcional", "deseable"); en
+# modo flexible, además, sin condición ("si posee", "si aplica").
+#
+# PREFILTRO_MODO:
+#   "flexible" (defecto): ignora requisitos con alternativas o condiciones
+#       ("o tecnólogo", "si aplica", "si posee") y solo descarta por experiencia si el
+#       tope calculado no llega a FRACCION_FLEXIBLE del mínimo.
+#   "estricto": aplica las reglas aunque el perfil tenga alternativas o
+#       condiciones (nunca si el requisito está negado) y descarta por
+#       experiencia con cualquier tope inferior al mínimo.
+#   "apagado": no se aplica.
+
+MODOS = ("flexible", "estricto", "apagado")
+PREFILTRO_MODO = os.environ.get("PREFILTRO_MODO", "flexible")
+FRACCION_FLEXIBLE = float(os.environ.get("PREFILTRO_FRACCION_FLEXIBLE", 0.5))
+
+MODELO_PREFILTRO = "prefiltro"  # Valor de 'modelo' en el historial
+
+MESES = {"enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6, "julio": 7,
+         "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12}
+
+# Los patrones se aplican sobre texto en minúsculas y sin tildes (ver _plano)
+RE_EXIGE_TITULO = re.compile(r"titulo\s+(?:de\s+)?profesional|profesional\s+(?:universitario|en\b)|pregrado")
+RE_ALTERNATIVA_TITULO = re.compile(r"tecnolog|tecnico|equivalenc|homolog")
+RE_EVIDENCIA_TITULO = re.compile(
+    r"titulo|diploma|acta\s+de\s+grado|grado|otorga|confiere|profesional|ingenier|licenciad"
+    r"|tecnolog|abogad|contador|administrador|arquitect|medic|economista|psicolog")
+
+RE_EXIGE_TARJETA = re.compile(r"tarjeta\s+profesional|matricula\s+profesional|copnia")
+RE_EVIDENCIA_TARJETA = re.compile(
+    r"tarjeta\s+profesional|matricula\s+profesional|copnia|consejo\s+profesional|registro\s+profesional")
+
+# Oraciones del perfil en las que un requisito no es obligatorio
+RE_ORACION = re.compile(r"[^.;\n]+")
+RE_NEGACION = re.compile(
+    r"\bno\s+(?:se\s+)?(?:requiere|exige|solicita|pide|necesita|aplica)"
+    r"|\bno\s+es\s+(?:necesari|obligatori|requisito|indispensable)"
+    r"|\bsin\s+(?:necesidad\s+de\s+)?(?:tarjeta|matricula|titulo)|\bopcional|\bdeseable")
+RE_CONDICION = re.compile(
+    r"\bsi\s+(?:aplica|posee|tiene|cuenta|acredita|lo\s+tiene|la\s+tiene)|\bcuando\s+(?:aplique|posea|tenga)"
+    r"|\ben\s+(?:los\s+)?casos?\b|\ben\s+caso\s+de|reglamentad|de\s+ser\s+requerid|\bde\s+contar\s+con"
+    r"|preferible|\bpreferiblemente")
+
+RE_DURACION = re.compile(r"\(?\b(\d{1,3})\)?\s*(mes(?:es)?|anos?)\b")
+RE_FECHA_NUMERICA = re.compile(r"\b(\d{1,2})[/.-](\d{1,2})[/.-]((?:19|20)\d{2})\b")
+RE_FECHA_NUMERICA_CUALQUIERA = re.compile(r"\b\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}\b")
+RE_FECHA_TEXTO = re.compile(r"\b(?:(\d{1,2})\s+de\s+)?(" + "|".join(MESES) + r")\s+(?:de|del)?\s*((?:19|20)\d{2})\b")
+RE_ANIO = re.compile(r"\b((?:19|20)\d{2})\b")
+RE_VIGENTE = re.compile(r"a\s+la\s+fecha|hasta\s+la\s+fecha|actualmente|vigente|en\s+curso|hasta\s+hoy")
+
+
+def _plano(texto):
+    """Minúsculas y sin tildes, para que los patrones no dependan de la ortografía."""
+    texto = unicodedata.normalize("NFKD", (texto or "").lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def soporte_legible(soporte):
+    """El texto del soporte representa todo su contenido (no es imagen ni escaneado)."""
+    texto = (soporte.get("texto") or "").strip()
+    return (soporte.get("imagen") is None and len(texto) >= MIN_CARACTERES_TEXTO
+            and not texto.startswith("[Error PDF"))
+
+
+def exigido(patron, req_plano, estricto=False):
+    """El perfil menciona el requisito en alguna oración sin negación (ni condición, salvo en estricto)."""
+    return any(patron.search(o) and not RE_NEGACION.search(o) and (estricto or not RE_CONDICION.search(o))
+               for o in RE_ORACION.findall(req_plano))
+
+
+def meses_minimos(req_plano):
+    """Menor cantidad de meses de experiencia exigida en el perfil (None si no la hay).
+
+    Se toma la menor de las duraciones cercanas a "experiencia" para no
+    endurecer perfiles con varias alternativas.
+    """
+    duraciones = []
+    for m in re.finditer(r"experiencia", req_plano):
+        ventana = req_plano[max(0, m.start() - 80):m.end() + 120]
+        for cantidad, unidad in RE_DURACION.findall(ventana):
+            meses = int(cantidad) * (12 if unidad.startswith("ano") else 1)
+            if meses > 0:
+                duraciones.append(meses)
+    return min(duraciones) if duraciones else None
+
+
+def _fechas(texto_plano):
+    """Fechas mencionadas en el texto; de un año suelto se toman sus extremos.
+
+    Retorna None si alguna fecha numérica no se puede interpretar (ej.
+    "01/02/18"): el periodo del soporte queda desconocido.
+    """
+    fechas = []
+    numericas = RE_FECHA_NUMERICA.findall(texto_plano)
+    if len(numericas) < len(RE_FECHA_NUMERICA_CUALQUIERA.findall(texto_plano)):
+        return None
+    for d, m, a in numericas:
+        try:
+            fechas.append(date(int(a), int(m), int(d)))
+        except ValueError:
+            try:
+                fechas.append(date(int(a), int(d), int(m)))  # Formato MM/DD/AAAA
+            except ValueError:
+                return None
+    for d, mes, a in RE_FECHA_TEXTO.findall(texto_plano):
+        fechas.append(date(int(a), MESES[mes], min(int(d or 1), 28)))
+    for a in RE_ANIO.findall(texto_plano):
+        fechas += [date(int(a), 1, 1), date(int(a), 12, 31)]
+    return fechas
+
+
+def tope_meses_certificados(soportes, hoy=None):
+    """Cota superior de los meses de experiencia que pueden certificar los soportes.
+
+    Por soporte se toma el periodo entre la fecha más antigua y la más reciente
+    que menciona (hasta hoy si dice "a la fecha", "actualmente", ...). Se suman
+    sin descontar traslapes: el valor real nunca es mayor. Retorna None si el
+    periodo de algún soporte no se puede determinar.
+    """
+    hoy = hoy or date.today()
+    total = 0
+    for soporte in soportes:
+        texto = _plano(soporte.get("texto"))
+        fechas = _fechas(texto)
+        if fechas is None:
+            return None
+        if RE_VIGENTE.search(texto):
+            fechas.append(hoy)
+        if len(fechas) >= 2:
+            inicio, fin = min(fechas), max(fechas)
+            total += (fin.year - inicio.year) * 12 + (fin.month - inicio.month) + 1
+    return total
+
+
+def prefiltrar(req_content, soportes, modo=None):
+    """Reglas incumplidas de forma demostrable; lista vacía si hay que consultar al modelo.
+
+    soportes: dicts con 'texto' e 'imagen' (los únicos, tras deduplicar).
+    Cada fallo es un dict con 'regla' y 'motivo'.
+    """
+    modo = modo or PREFILTRO_MODO
+    if modo not in MODOS:
+        raise ValueError(f"Modo de prefiltro desconocido: {modo}. Opciones: {', '.join(MODOS)}")
+    if modo == "apagado" or not soportes or not all(soporte_legible(s) for s in soportes):
+        return []
+
+    req = _plano(req_content)
+    textos = [_plano(s.get("texto")) for s in soportes]
+    estricto = modo == "estricto"
+    fallos = []
+
+    if exigido(RE_EXIGE_TITULO, req, estricto) and (estricto or not RE_ALTERNATIVA_TITULO.search(req)):
+        if not any(RE_EVIDENCIA_TITULO.search(t) for t in textos):
+            fallos.append({"regla": "titulo",
+                           "motivo": "El perfil exige título profesional y ningún soporte menciona un título o grado."})
+
+    if exigido(RE_EXIGE_TARJETA, req, estricto):
+        if not any(RE_EVIDENCIA_TARJETA.search(t) for t in textos):
+            fallos.append({"regla": "tarjeta",
+                           "motivo": "El perfil exige tarjeta o matrícula profesional y ningún soporte la menciona."})
+
+    minimo = meses_minimos(req)
+    if minimo:
+        tope = tope_meses_certificados(soportes)
+        umbral = minimo if estricto else minimo * FRACCION_FLEXIBLE
+        if tope is not None and tope < umbral:
+            fallos.append({"regla": "experiencia",
+                           "motivo": (f"El perfil exige {minimo} meses de experiencia y las fechas de los "
+                                      f"soportes abarcan como máximo {tope} meses.")})
+    return fallos
+
+
+def resultado_prefiltro(nombre, identificacion, fallos, modo=None):
+    """Concepto NO CUMPLE con el mismo esquema JSON que retorna el modelo."""
+    motivos = " ".join(f["motivo"] for f in fallos)
+    filas = "\n".join(f"| {f['regla']} | NO CUMPLE | {f['motivo']} |" for f in fallos)
+    return {
+        "nombre": nombre,
+        "cedula": identificacion,
+        "concepto_final": "NO CUMPLE",
+        "idoneidad_texto": f"CONCLUSIÓN: NO CUMPLE. Prefiltro automático (sin análisis del modelo): {motivos}",
+        "formacion_texto": "No se acreditó en los soportes." if any(f["regla"] == "titulo" for f in fallos) else "",
+        "experiencia_lista": [],
+        "analisis_detallado_markdown": (
+            "| Requisito | Estado | Justificación |\n| :--- | :---: | :--- |\n" + filas +
+            "\n\n**Conclusión Final:** NO APTO. Descartado por el prefiltro local; "
+            "si los soportes están incompletos, cargue la evidencia faltante y evalúe de nuevo."
+        ),
+        "prefiltro": {"modo": modo or PREFILTRO_MODO, "reglas": fallos},
+    }
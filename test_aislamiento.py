@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_trabajadores_no_ejecutan_el_script_principal(tmp_path):
+    # Como evaluador_sena_ai.py bajo Streamlit: un __main__ sin guardia __name__
+    marcas = tmp_path / "ejecuciones.txt"
+    script = tmp_path / "app_sin_guardia.py"
+    script.write_text(textwrap.dedent(f"""
+        import os
+        import aislamiento
+        with open({str(marcas)!r}, "a") as f:
+            f.write("x")
+        pool = aislamiento.PoolAislado(procesos=2)
+        print(pool.ejecutar(os.getpid) != os.getpid(), pool.ejecutar(sum, [1, 2, 3]))
+        pool.cerrar()
+    """))
+    env = dict(os.environ, PYTHONPATH=RAIZ)
+    salida = subprocess.run([sys.executable, str(script)], capture_output=True, text=True, env=env, timeout=120)
+    assert salida.returncode == 0, salida.stderr
+    assert salida.stdout.split() == ["True", "6"]
+    assert marcas.read_text() == "x"
@@ -0,0 +1,35 @@
+import io
+
+from PIL import Image, ImageDraw
+
+from deduplicacion import deduplicar_soportes, hash_contenido
+
+
+def escaneo(lineas):
+    """Foto de un certificado: hoja blanca con unas líneas de texto negro."""
+    imagen = Image.new("RGB", (850, 1100), "white")
+    dibujo = ImageDraw.Draw(imagen)
+    for i, linea in enumerate(lineas):
+        dibujo.text((80, 120 + 40 * i), linea, fill="black")
+    buffer = io.BytesIO()
+    imagen.save(buffer, "JPEG")
+    return {"nombre": lineas[0], "hash": hash_contenido(buffer.getvalue()), "tipo": "image/jpeg",
+            "texto": None, "imagen": Image.open(buffer)}
+
+
+def test_escaneos_distintos_se_conservan():
+    certificado = escaneo(["CONSTRUCTORA HUILA S.A.S.", "Certifica que Juan Perez laboro",
+                           "desde el 01/02/2018 hasta el 31/01/2021"])
+    diploma = escaneo(["UNIVERSIDAD SURCOLOMBIANA", "Otorga el titulo de Ingeniero Civil",
+                       "a Juan Perez, Neiva, 15/12/2017"])
+    unicos, omitidos = deduplicar_soportes([certificado, diploma])
+    assert omitidos == []
+    assert len(unicos) == 2
+
+
+def test_mismo_archivo_se_omite():
+    certificado = escaneo(["CONSTRUCTORA HUILA S.A.S.", "Certifica que Juan Perez laboro"])
+    copia = dict(certificado, nombre="copia.jpg")
+    unicos, omitidos = deduplicar_soportes([certificado, copia])
+    assert [u["nombre"] for u in unicos] == [certificado["nombre"]]
+    assert omitidos == [{"nombre": "copia.jpg", "duplicado_de": certificado["nombre"], "motivo": "idéntico"}]
@@ -0,0 +1,55 @@
+from prefiltro import prefiltrar, tope_meses_certificados
+
+
+def soporte(texto):
+    return {"nombre": "certificado.pdf", "hash": "x", "tipo": "application/pdf", "texto": texto, "imagen": None}
+
+
+CERTIFICADO = soporte("La empresa Constructora Huila S.A.S. certifica que el señor Juan Pérez "
+                      "laboró como ingeniero residente desde el 01/02/2018 hasta el 31/01/2021.")
+
+
+def reglas(req, soportes, modo="flexible"):
+    return [f["regla"] for f in prefiltrar(req, soportes, modo)]
+
+
+def test_tarjeta_exigida_sin_evidencia():
+    assert reglas("Tarjeta profesional vigente.", [CERTIFICADO]) == ["tarjeta"]
+
+
+def test_tarjeta_negada_no_dispara():
+    assert reglas("No requiere tarjeta profesional.", [CERTIFICADO]) == []
+    assert reglas("Tarjeta profesional: no se exige.", [CERTIFICADO], "estricto") == []
+
+
+def test_tarjeta_condicional_no_dispara_en_flexible():
+    req = "24 meses de experiencia si posee tarjeta profesional."
+    assert "tarjeta" not in reglas(req, [CERTIFICADO])
+    assert reglas("Tarjeta profesional opcional.", [CERTIFICADO]) == []
+
+
+def test_tarjeta_condicional_en_otra_oracion_si_dispara():
+    req = "Tarjeta profesional vigente. Experiencia de 12 meses, o 6 si posee posgrado."
+    assert reglas(req, [CERTIFICADO]) == ["tarjeta"]
+
+
+def test_titulo_negado_no_dispara():
+    diploma = soporte("Certificado de asistencia al seminario de seguridad industrial, "
+                      "intensidad de 20 horas, expedido en Neiva.")
+    assert reglas("No se exige título profesional.", [diploma]) == []
+
+
+def test_anios_de_dos_digitos_son_desconocidos():
+    texto = ("La empresa Constructora Huila S.A.S. certifica que el señor Juan Pérez "
+             "laboró como ingeniero residente desde el 01/02/18 hasta el 31/01/21.")
+    assert tope_meses_certificados([soporte(texto)]) is None
+    assert reglas("Experiencia de 24 meses.", [soporte(texto)]) == []
+
+
+def test_experiencia_insuficiente_con_fechas_completas():
+    corto = soporte("La empresa Constructora Huila S.A.S. certifica que el señor Juan Pérez "
+                    "laboró como ingeniero residente desde el 01/02/2020 hasta el 30/04/2020.")
+    # El año suelto amplía la cota a todo 2020
+    assert tope_meses_certificados([corto]) == 12
+    assert reglas("Experiencia de 36 meses.", [corto]) == ["experiencia"]
+    assert reglas("Experiencia de 36 meses.", [CERTIFICADO]) == []